@@ -0,0 +1,256 @@
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import streamlit as st
+
+# Number of requests that can be in flight at once across every session of this server process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "16"))
+JOB_REFRESH_SECONDS = 2
+JOB_HISTORY = 10
+
+
+@st.cache_resource
+def get_job_pool():
+    # One pool per server process, shared by all sessions
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+
+class PollScheduler:
+    # Waits between poll attempts on one timer thread and runs each attempt on the job pool,
+    # so a generation that takes minutes doesn't hold a pool worker while it sleeps
+    def __init__(self, pool):
+        self._pool = pool
+        self._heap = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        threading.Thread(target=self._loop, name="job-poll", daemon=True).start()
+
+    def call_later(self, delay, fn):
+        with self._cond:
+            heapq.heappush(self._heap, (time.time() + delay, next(self._order), fn))
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.time():
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                _, _, fn = heapq.heappop(self._heap)
+            self._pool.submit(fn)
+
+    def poll(self, attempt_fn, interval, max_attempts):
+        # Calls attempt_fn(attempt) every interval seconds until it returns something other
+        # than None. The returned future gets that value, or the error attempt_fn raised.
+        result = Future()
+
+        def attempt(number):
+            try:
+                value = attempt_fn(number)
+            except Exception as e:
+                result.set_exception(e)
+                return
+            if value is not None:
+                result.set_result(value)
+            elif number >= max_attempts:
+                result.set_exception(RuntimeError("Generation timed out."))
+            else:
+                self.call_later(interval, lambda: attempt(number + 1))
+
+        self.call_later(interval, lambda: attempt(1))
+        return result
+
+
+@st.cache_resource
+def get_poll_scheduler():
+    return PollScheduler(get_job_pool())
+
+
+def then(future, fn):
+    # Future for fn(result), run on whichever thread completes the first future
+    chained = Future()
+
+    def done(finished):
+        try:
+            chained.set_result(fn(finished.result()))
+        except Exception as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(done)
+    return chained
+
+
+class SingleFlight:
+    # Identical submissions from any session attach to the one call already in flight
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.submitted = 0
+        self.coalesced = 0
+
+    def submit(self, fingerprint, job, start):
+        # Returns (future, leader job); start() is only called when nothing identical is running
+        with self._lock:
+            self.submitted += 1
+            if fingerprint in self._inflight:
+                self.coalesced += 1
+                return self._inflight[fingerprint]
+            future = start()
+            self._inflight[fingerprint] = (future, job)
+        future.add_done_callback(lambda _: self._forget(fingerprint))
+        return future, job
+
+    def _forget(self, fingerprint):
+        with self._lock:
+            self._inflight.pop(fingerprint, None)
+
+
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
+
+
+def request_fingerprint(url, files, data, *extra, credential=None):
+    # Canonical form of a request as it goes over the wire: form values are sent as strings
+    # and file contents are reduced to hashes. Only sessions with the same API key share a
+    # request, so nobody gets another account's result or its auth and credit errors.
+    canonical = {
+        "url": url,
+        "data": {key: str(value) for key, value in data.items()},
+        "files": {
+            field: hashlib.sha256(content if isinstance(content, bytes) else str(content).encode()).hexdigest()
+            for field, content in files.items()
+        },
+        "extra": [str(value) for value in extra],
+        "credential": hashlib.sha256(credential.encode()).hexdigest() if credential else None,
+    }
+    # Without a fixed seed (0 or none) each call should give a new result, so only repeats
+    # from the same session, like a double-clicked button, are shared
+    if str(data.get("seed", 0)) == "0":
+        canonical["session"] = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def _settle(future, done):
+    # Give future the outcome of the finished future done
+    if done.exception() is not None:
+        future.set_exception(done.exception())
+    else:
+        future.set_result(done.result())
+
+
+def submit_job(label, fn, *args, on_done=None, fingerprint=None, **kwargs):
+    # fn runs on the pool and gets the job dict first so it can report progress.
+    # on_done runs back on the script thread with fn's return value once it finishes.
+    # Jobs with the same fingerprint as one already in flight share its result instead of running again.
+    # fn may return a Future (see PollScheduler.poll) to finish later without holding a worker.
+    job = {
+        "id": uuid.uuid4().hex[:8],
+        "label": label,
+        "status": "queued",
+        "progress": "",
+        "error": None,
+        "submitted": time.time(),
+        "finished": None,
+        "on_done": on_done,
+    }
+
+    def start():
+        future = Future()
+
+        def run():
+            job["status"] = "running"
+            try:
+                result = fn(job, *args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                return
+            if isinstance(result, Future):
+                result.add_done_callback(lambda done: _settle(future, done))
+            else:
+                future.set_result(result)
+
+        get_job_pool().submit(run)
+        return future
+
+    if fingerprint is None:
+        job["future"] = start()
+    else:
+        job["future"], leader = get_single_flight().submit(fingerprint, job, start)
+        if leader is not job:
+            job["leader"] = leader
+    st.session_state.setdefault("jobs", []).append(job)
+    return job
+
+
+def is_active(job):
+    return job["status"] in ("queued", "running")
+
+
+def finish_job(job):
+    job["finished"] = time.time()
+    try:
+        result = job["future"].result()
+        if job["on_done"]:
+            job["on_done"](result)
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = str(e)
+    # Finished jobs hold their whole response (video or GLB bytes), so only keep the ones shown
+    jobs = st.session_state.get("jobs", [])
+    finished = [old for old in jobs if not is_active(old)]
+    if len(finished) > JOB_HISTORY:
+        dropped = {id(old) for old in finished[:-JOB_HISTORY]}
+        st.session_state["jobs"] = [old for old in jobs if id(old) not in dropped]
+
+
+def clear_finished_jobs():
+    st.session_state["jobs"] = [job for job in st.session_state.get("jobs", []) if is_active(job)]
+
+
+def _jobs_panel():
+    jobs = st.session_state.get("jobs", [])
+    finished_now = False
+    for job in jobs:
+        if is_active(job) and job["future"].done():
+            finish_job(job)
+            finished_now = True
+    if finished_now:
+        # Results update state used all over the page, so redraw everything
+        st.rerun()
+
+    st.subheader("⏳ Jobs")
+    if not jobs:
+        st.caption("No jobs yet.")
+        return
+    for job in reversed(jobs[-JOB_HISTORY:]):
+        elapsed = (job["finished"] or time.time()) - job["submitted"]
+        # Coalesced jobs report the progress of the request they are attached to
+        source = job.get("leader", job) if is_active(job) else job
+        shared = " (shared with an identical request)" if "leader" in job else ""
+        if source["status"] == "queued":
+            st.write(f"🕒 {job['label']} - queued{shared} ({elapsed:.0f}s)")
+        elif source["status"] == "running":
+            st.info(f"🔄 {job['label']} - {source['progress'] or 'running'}{shared} ({elapsed:.0f}s)")
+        elif job["status"] == "done":
+            st.success(f"✅ {job['label']} ({elapsed:.0f}s)")
+        else:
+            st.error(f"❌ {job['label']}: {job['error']}")
+    flight = get_single_flight()
+    if flight.coalesced:
+        st.caption(f"Duplicate requests avoided: {flight.coalesced} of {flight.submitted}")
+    if any(not is_active(job) for job in jobs):
+        st.button("Clear finished jobs", key="clear_finished_jobs", on_click=clear_finished_jobs)
+
+
+def render_jobs():
+    # Only poll while something is in flight; a finished job triggers a full rerun which turns polling off
+    active = any(is_active(job) for job in st.session_state.get("jobs", []))
+    st.fragment(_jobs_panel, run_every=JOB_REFRESH_SECONDS if active else None)()
@@ -1,10 +1,13 @@
 import streamlit as st
-import replicate
 import os
-from dotenv import load_dotenv
+import json
+import time
+from jobs import request_fingerprint, submit_job, render_jobs
+from traffic import digest, get_recorder
+from startup import get_replicate_version, lazy_import, memoize
 
-# Load environment variables from .env if available
-load_dotenv()
+# Load environment variables from .env if available, once per process
+memoize("dotenv", lambda: lazy_import("dotenv").load_dotenv())
 
 # Title and Sidebar Setup
 st.set_page_config(page_title="Replicate Model Explorer")
@@ -14,9 +17,8 @@ st.title("Replicate Model Explorer")
 st.sidebar.title("Configuration")
 api_key = st.sidebar.text_input("Enter your Replicate API Key", type="password")
 
-# Verify API Key and Initialize Client
+# Verify API Key; the Replicate client is created on the first model lookup
 if api_key:
-    replicate_client = replicate.Client(api_token=api_key)
     st.sidebar.success("API Key is set!", icon="✅")
 else:
     st.sidebar.warning("Please enter your API key to proceed.")
@@ -30,14 +32,40 @@ temperature = st.sidebar.slider("Temperature", 0.0, 1.0, 0.5)
 top_p = st.sidebar.slider("Top P", 0.0, 1.0, 0.9)
 max_length = st.sidebar.slider("Max Length", 16, 512, 128)
 
+# Records predictions to TRAFFIC_CAPTURE when set
+recorder = get_recorder()
+
+# Runs on the shared worker pool so the session stays responsive while the model runs
+def predict_job(job, model_name, version, inputs):
+    job["progress"] = "Running prediction..."
+    started = time.time()
+    try:
+        output = version.predict(**inputs)
+    except Exception as e:
+        # Failed predictions are part of the traffic too
+        recorder.record(
+            "PREDICT", f"replicate://{model_name}/{version.id}", None, time.time() - started, inputs,
+            job=job["id"], status="error", error=str(e),
+        )
+        raise
+    output_bytes = json.dumps(output, default=str).encode()
+    recorder.record(
+        "PREDICT", f"replicate://{model_name}/{version.id}", None, time.time() - started, inputs,
+        job=job["id"], status="ok", response_size=len(output_bytes), response_sha256=digest(output_bytes),
+    )
+    return output
+
+def store_output(output):
+    st.session_state["model_output"] = output
+
 # Model Interaction Section
 st.write("### Model Interaction")
 if model_url and api_key:
     try:
         # Extract model info
         model_name = model_url.split("/")[-1]  # Extracts the model ID
-        model = replicate_client.models.get(model_name)
-        version = model.versions.list()[0]  # Get latest version
+        # Latest version, cached per process (and prefetched by serve.py with PREWARM_MODELS)
+        model, version = get_replicate_version(api_key, model_name)
 
         # Display model info
         st.write(f"**Model:** {model_name}")
@@ -48,30 +76,38 @@ if model_url and api_key:
 
         # Run Model and Display Results
         if st.button("Generate"):
-            with st.spinner("Generating..."):
-                try:
-                    # Define parameters based on input
-                    inputs = {
-                        "prompt": prompt,
-                        "temperature": temperature,
-                        "top_p": top_p,
-                        "max_length": max_length,
-                    }
-
-                    # Run the model prediction
-                    output = version.predict(**inputs)
-
-                    # Display output based on type
-                    if isinstance(output, str) and output.startswith("http"):
-                        st.image(output, caption="Generated Image")
-                    elif isinstance(output, list) and any(isinstance(i, dict) for i in output):
-                        st.video(output[0]["url"])
-                    elif isinstance(output, str):
-                        st.write(output)
-                    else:
-                        st.json(output)
-                except Exception as e:
-                    st.error(f"Error during model execution: {e}")
+            # Define parameters based on input
+            inputs = {
+                "prompt": prompt,
+                "temperature": temperature,
+                "top_p": top_p,
+                "max_length": max_length,
+            }
+
+            # Queue the model prediction
+            # Identical predictions already running in any session are shared rather than re-run
+            submit_job(
+                f"Generate ({model_name})",
+                predict_job,
+                model_name,
+                version,
+                inputs,
+                on_done=store_output,
+                fingerprint=request_fingerprint(f"{model_name}:{version.id}", {}, inputs, credential=api_key),
+            )
+            st.info("Generation queued - track its progress in the sidebar.")
+
+        # Display output based on type
+        output = st.session_state.get("model_output")
+        if output is not None:
+            if isinstance(output, str) and output.startswith("http"):
+                st.image(output, caption="Generated Image")
+            elif isinstance(output, list) and any(isinstance(i, dict) for i in output):
+                st.video(output[0]["url"])
+            elif isinstance(output, str):
+                st.write(output)
+            else:
+                st.json(output)
     except Exception as e:
         st.error("Invalid model link or parameters. Please verify your inputs.")
 else:
@@ -89,7 +125,6 @@ if save_favorite and favorite_name:
 
 # Export Favorites as JSON
 if st.sidebar.button("Export Favorites as JSON"):
-    import json
     with open("favorites.json", "w") as f:
         json.dump(st.session_state.get("favorites", []), f)
     st.sidebar.success("Favorites exported as favorites.json")
@@ -104,3 +139,8 @@ if st.sidebar.checkbox("Load Favorite"):
             model_url = favorite_data["url"]
             inputs = favorite_data["params"]
             st.sidebar.info(f"Loaded settings for '{selected_favorite}'")
+
+# Background jobs
+with st.sidebar:
+    st.markdown("---")
+    render_jobs()
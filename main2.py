@@ -1,12 +1,25 @@
 import streamlit as st
-import requests
+from startup import STARTUP_OPTIMIZED, RenderTimer, get_http_session, lazy_import, show_startup_timings, warm_connections
+
+# Started ahead of the other imports so a process's first run shows what they cost
+render_timer = RenderTimer()
 import json
-from PIL import Image
 from io import BytesIO
 import base64
-import time
 import os
-from streamlit_drawable_canvas import st_canvas
+import uuid
+import datetime
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from jobs import JOB_REFRESH_SECONDS, get_poll_scheduler, request_fingerprint, submit_job, render_jobs
+from output_store import AssetNotFoundError, get_output_store, safe_namespace
+from router import QUALITY_TIERS, TEXT_TO_IMAGE_MODELS, get_router, text_to_image_model_key
+from traffic import get_recorder
+from stability_api import MAX_POLLS, StabilityClient, check_response, request_record
+from sweeps import MAX_SWEEP_SIZE, parse_sweep_values
+from previews import THUMBNAIL_WIDTH, bytes_digest, show_preview, show_image_preview, show_full_resolution_download
+
+render_timer.mark("imports")
 
 # Set page configuration
 st.set_page_config(
@@ -16,13 +29,40 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-# Create the directory for saving generated images if it doesn't exist
-if not os.path.exists("generated_images"):
-    os.makedirs("generated_images")
+# Base URL of the Stability API; point it at a stand-in server (see replay.py) to test against recorded traffic
+API_BASE = os.getenv("STABILITY_API_BASE", "https://api.stability.ai")
+
+# Shared output store: per-workspace folders, content-hashed names and a size quota
+output_store = get_output_store()
+# Per-model latency and error statistics for the text-to-image router
+router = get_router()
+# Records API traffic to TRAFFIC_CAPTURE when set
+recorder = get_recorder()
+# Schedules result polls without tying up a job worker between attempts
+poll_scheduler = get_poll_scheduler()
+# Pooled HTTP session shared by all sessions; serve.py opens its connections before the first visitor
+http = get_http_session()
+warm_connections(API_BASE)
+
+
+def pil_image():
+    # PIL is imported when an image is first decoded rather than on the first page load
+    return lazy_import("PIL.Image")
+
 
 # Initialize session state for current image
 if 'current_image' not in st.session_state:
     st.session_state['current_image'] = None
+if 'result_images' not in st.session_state:
+    st.session_state['result_images'] = []
+if 'current_video' not in st.session_state:
+    st.session_state['current_video'] = None
+if 'current_model' not in st.session_state:
+    st.session_state['current_model'] = None
+if 'sweeps' not in st.session_state:
+    st.session_state['sweeps'] = {}
+if 'workspace' not in st.session_state:
+    st.session_state['workspace'] = f"session-{uuid.uuid4().hex[:8]}"
 
 # Custom CSS for styling
 st.markdown(
@@ -88,125 +128,315 @@ headers = {
     "Authorization": f"Bearer {api_key}",
 }
 
-# Sidebar - User Account
-st.sidebar.markdown("---")
-st.sidebar.header("👤 User Account")
+# Sidebar - Workspace
+workspace = safe_namespace(st.sidebar.text_input(
+    "Workspace",
+    key="workspace",
+    help="Outputs are saved per workspace. Use the same name across sessions to keep your files together.",
+))
 
-if st.sidebar.button("View Account Details", key="account_details"):
-    with st.spinner("Fetching account details..."):
-        response = requests.get(
-            "https://api.stability.ai/v1/user/account",
-            headers=headers,
-        )
-    if response.status_code == 200:
-        account_info = response.json()
-        st.sidebar.success("Account Details:")
-        st.sidebar.json(account_info)
-    else:
-        st.sidebar.error(f"Error: {response.status_code} - {response.text}")
+# Helper Functions
+@st.cache_resource
+def get_decode_pool():
+    # Shared by all sessions; base64/PNG decoding and encoding release the GIL
+    return ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) * 2), thread_name_prefix="decode")
 
-if st.sidebar.button("View Account Balance", key="account_balance"):
-    with st.spinner("Fetching account balance..."):
-        response = requests.get(
-            "https://api.stability.ai/v1/user/balance",
-            headers=headers,
-        )
-    if response.status_code == 200:
-        balance_info = response.json()
-        st.sidebar.success(f"💰 Credits: {balance_info['credits']}")
-    else:
-        st.sidebar.error(f"Error: {response.status_code} - {response.text}")
+# API calls and result saving for this session; its methods are what the job functions run
+api = StabilityClient(
+    API_BASE, api_key, workspace, http, output_store, router, recorder, poll_scheduler, get_decode_pool()
+)
 
-# Helper Functions
+def image_png_bytes(img):
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def show_current_image(key):
+    img = st.session_state['current_image']
+    show_image_preview(st, img, caption="Current Image")
+    show_full_resolution_download(st, f"{key}_current_image", lambda: image_png_bytes(img), "current_image.png")
+
+def select_result_image(idx):
+    st.session_state['current_image'] = st.session_state['result_images'][idx]
+
+def show_result_grid(key):
+    images = st.session_state['result_images']
+    if len(images) < 2:
+        return
+    st.write(f"**{len(images)} samples generated** - pick one to load into the canvas:")
+    cols = st.columns(4)
+    for idx, img in enumerate(images):
+        col = cols[idx % 4]
+        show_image_preview(col, img, width=THUMBNAIL_WIDTH, caption=f"Sample {idx + 1}")
+        col.button("Use this sample", key=f"{key}_use_sample_{idx}", on_click=select_result_image, args=(idx,))
+
+# on_done callbacks: only successful responses get here, since check_response raises on
+# anything else and the error is shown on the failed job
 def display_image(response, save_prefix="generated_image"):
-    if response.status_code == 200:
-        content_type = response.headers.get('Content-Type')
-        if content_type and 'application/json' in content_type:
-            data = response.json()
-            if 'artifacts' in data:
-                artifacts = data['artifacts']
-                img_data = base64.b64decode(artifacts[0]['base64'])
-                img = Image.open(BytesIO(img_data))
-                # Update session state
-                st.session_state['current_image'] = img
-                # Save the image
-                img_filename = f"{save_prefix}_{int(time.time())}.png"
-                img.save(os.path.join("generated_images", img_filename))
-        else:
-            img = Image.open(BytesIO(response.content))
-            # Update session state
-            st.session_state['current_image'] = img
-            # Save the image
-            img_filename = f"{save_prefix}_{int(time.time())}.png"
-            img.save(os.path.join("generated_images", img_filename))
-    else:
-        try:
-            st.error(f"Error: {response.status_code} - {response.json().get('message', response.text)}")
-        except:
-            st.error(f"Error: {response.status_code} - {response.text}")
+    images = api.save_images(response, save_prefix)
+    if images:
+        # Update session state
+        st.session_state['result_images'] = images
+        st.session_state['current_image'] = images[0]
 
 def display_video(response, save_prefix="generated_video"):
-    if response.status_code == 200:
-        video_bytes = response.content
-        st.video(video_bytes)
-        # Save the video
-        video_filename = f"{save_prefix}_{int(time.time())}.mp4"
-        with open(os.path.join("generated_images", video_filename), "wb") as f:
-            f.write(video_bytes)
-    else:
-        try:
-            st.error(f"Error: {response.status_code} - {response.json().get('message', response.text)}")
-        except:
-            st.error(f"Error: {response.status_code} - {response.text}")
+    # Save the video
+    st.session_state['current_video'] = api.save_file(response, save_prefix, "mp4")
 
 def display_3d_model(response, save_prefix="generated_model"):
-    if response.status_code == 200:
-        glb_data = response.content
-        b64_glb = base64.b64encode(glb_data).decode("utf-8")
-        st.components.v1.html(
-            f"""
-            <model-viewer src="data:model/gltf-binary;base64,{b64_glb}"
-                          style="width: 100%; height: 600px;"
-                          autoplay
-                          camera-controls
-                          ar>
-            </model-viewer>
-            <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
-            """,
-            height=600,
+    # Save the model
+    st.session_state['current_model'] = api.save_file(response, save_prefix, "glb")
+
+def show_3d_model(glb_data):
+    b64_glb = base64.b64encode(glb_data).decode("utf-8")
+    st.components.v1.html(
+        f"""
+        <model-viewer src="data:model/gltf-binary;base64,{b64_glb}"
+                      style="width: 100%; height: 600px;"
+                      autoplay
+                      camera-controls
+                      ar>
+        </model-viewer>
+        <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
+        """,
+        height=600,
+    )
+
+AUTO_MODEL = "Auto (fastest within budget)"
+
+def show_router_stats():
+    rows = []
+    for model_type, info in TEXT_TO_IMAGE_MODELS.items():
+        key = text_to_image_model_key(model_type)
+        median, error_rate, calls = router.stats(key)
+        rows.append({
+            "Model": model_type,
+            "Tier": info["tier"],
+            "Credits": info["credits"],
+            "Median latency (s)": f"{median:.1f}" if median is not None else f"~{info['latency']}",
+            "Error rate": f"{error_rate:.0%}",
+            "Calls": calls,
+            "Status": "ok" if router.is_healthy(key) else "degraded",
+        })
+    st.table(rows)
+
+def reproduce_asset(name):
+    # Re-issue the exact request recorded for an asset
+    metadata = output_store.metadata(workspace, name)
+    if metadata is None:
+        st.error(f"{name} is no longer stored, so it can't be reproduced.")
+        return
+    record = metadata["request"]
+    try:
+        files = {field: output_store.read(workspace, asset) for field, asset in record["inputs"].items()}
+    except AssetNotFoundError:
+        st.error("The input files for this result have been evicted, so it can't be reproduced.")
+        return
+    if name.endswith('.mp4'):
+        on_done = display_video
+    elif name.endswith('.glb'):
+        on_done = display_3d_model
+    else:
+        on_done = display_image
+    if record["result_url"]:
+        submit_api_job(
+            f"Reproduce {name}",
+            api.generation_job,
+            record["endpoint"],
+            files=files or {"none": ""},
+            data=record["params"],
+            result_url=record["result_url"],
+            accept_header=record["accept_header"],
+            on_done=on_done,
         )
-        # Save the model
-        model_filename = f"{save_prefix}_{int(time.time())}.glb"
-        with open(os.path.join("generated_images", model_filename), "wb") as f:
-            f.write(glb_data)
     else:
-        try:
-            st.error(f"Error: {response.status_code} - {response.json().get('message', response.text)}")
-        except:
-            st.error(f"Error: {response.status_code} - {response.text}")
-
-def start_polling(generation_id, result_url, accept_header):
-    max_retries = 30
-    retry_delay = 10  # seconds
-    for attempt in range(max_retries):
-        time.sleep(retry_delay)
-        result_response = requests.get(
-            result_url,
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Accept": accept_header,
-            },
+        submit_api_job(
+            f"Reproduce {name}",
+            api.post_job,
+            record["endpoint"],
+            files=files or {"none": ""},
+            data=record["params"],
+            accept_header=record["accept_header"],
+            on_done=on_done,
+        )
+    st.info("Reproduction queued - track its progress in the sidebar.")
+
+def show_reproduce_button(container, name):
+    if output_store.metadata(workspace, name) is not None:
+        if container.button("🔁 Reproduce", key=f"reproduce_{name}"):
+            reproduce_asset(name)
+
+# Parameter sweeps: every combination is submitted under a concurrency cap and the
+# resulting generation IDs are polled together in one loop
+SWEEP_CONCURRENCY = 4
+
+def new_sweep(url, files, base_data, grid, result_url=None, accept_header=None, save_prefix="sweep", ext="bin"):
+    names = list(grid)
+    cells = []
+    for combo in itertools.product(*(grid[name] for name in names)):
+        cells.append({
+            "params": dict(base_data, **dict(zip(names, combo))),
+            "label": ", ".join(f"{name}={value}" for name, value in zip(names, combo)),
+            "status": "queued",
+            "progress": "",
+            "generation_id": None,
+            "result": None,
+            "error": None,
+        })
+    return {
+        "url": url,
+        "files": files,
+        "result_url": result_url,
+        "accept_header": accept_header,
+        "save_prefix": save_prefix,
+        "ext": ext,
+        "cells": cells,
+    }
+
+def finish_sweep_cell(sweep, cell, response):
+    response.generation_request = request_record(
+        sweep["url"], sweep["files"], cell["params"], sweep["accept_header"], sweep["result_url"]
+    )
+    cell["result"] = api.save_file(response, sweep["save_prefix"], sweep["ext"])
+    cell["status"] = "done"
+
+def submit_sweep_cell(sweep, cell):
+    try:
+        cell["status"] = "running"
+        response = api.send_request(cell, sweep["url"], sweep["files"], cell["params"], None if sweep["result_url"] else sweep["accept_header"])
+        if sweep["result_url"]:
+            cell["generation_id"] = response.json().get("id")
+            cell["progress"] = f"Generation ID: {cell['generation_id']}"
+        else:
+            finish_sweep_cell(sweep, cell, response)
+    except Exception as e:
+        cell["status"] = "error"
+        cell["error"] = str(e)
+
+def poll_sweep_cell(sweep, cell, job_id, attempt):
+    try:
+        result_response = api.fetch_result(
+            f"{sweep['result_url']}/{cell['generation_id']}", sweep["accept_header"],
+            job=job_id, generation_id=cell["generation_id"], poll_attempt=attempt,
         )
         if result_response.status_code == 200:
-            return result_response
-        elif result_response.status_code == 202:
-            st.info(f"Generation in progress... ({attempt + 1}/{max_retries})")
-            continue
+            finish_sweep_cell(sweep, cell, result_response)
+        elif result_response.status_code != 202:
+            check_response(result_response)
+    except Exception as e:
+        cell["status"] = "error"
+        cell["error"] = str(e)
+
+def finish_sweep(sweep):
+    cells = sweep["cells"]
+    for cell in cells:
+        if cell["status"] == "running":
+            cell["status"] = "error"
+            cell["error"] = "Generation timed out."
+    failed = sum(cell["status"] == "error" for cell in cells)
+    if failed == len(cells):
+        raise RuntimeError(f"All {failed} sweep runs failed")
+    return sweep
+
+def sweep_job(job, sweep):
+    cells = sweep["cells"]
+    with ThreadPoolExecutor(max_workers=SWEEP_CONCURRENCY, thread_name_prefix="sweep") as pool:
+        list(pool.map(lambda cell: submit_sweep_cell(sweep, cell), cells))
+
+    def attempt(number):
+        # The pending generation IDs are polled together, then the next round is scheduled
+        pending = [cell for cell in cells if cell["status"] == "running"]
+        with ThreadPoolExecutor(max_workers=SWEEP_CONCURRENCY, thread_name_prefix="sweep") as pool:
+            list(pool.map(lambda cell: poll_sweep_cell(sweep, cell, job["id"], number), pending))
+        job["progress"] = f"{sum(cell['status'] == 'done' for cell in cells)}/{len(cells)} finished"
+        if number < MAX_POLLS and any(cell["status"] == "running" for cell in cells):
+            return None
+        return finish_sweep(sweep)
+
+    job["progress"] = f"{sum(cell['status'] == 'done' for cell in cells)}/{len(cells)} finished"
+    if not any(cell["status"] == "running" for cell in cells):
+        return finish_sweep(sweep)
+    return poll_scheduler.poll(attempt, api.poll_interval, MAX_POLLS)
+
+def _sweep_status(kind):
+    # Refreshed every few seconds while the sweep runs, so it only sends captions; the
+    # results themselves are shown once, by a full rerun when the last run finishes
+    cells = st.session_state['sweeps'][kind]["cells"]
+    if not any(cell["status"] in ("queued", "running") for cell in cells):
+        st.rerun()
+    st.write(f"**Sweep progress** - {sum(cell['status'] == 'done' for cell in cells)}/{len(cells)} finished")
+    cols = st.columns(3)
+    for idx, cell in enumerate(cells):
+        col = cols[idx % 3]
+        col.caption(cell["label"])
+        if cell["status"] == "done":
+            col.success("Done")
+        elif cell["status"] == "error":
+            col.error(cell["error"])
         else:
-            st.error(f"Error: {result_response.status_code} - {result_response.text}")
-            break
-    st.error("Generation timed out.")
-    return None
+            col.info(cell["progress"] or cell["status"])
+
+def _sweep_grid(kind, show_result):
+    cells = st.session_state['sweeps'][kind]["cells"]
+    st.write(f"**Sweep results** - {sum(cell['status'] == 'done' for cell in cells)}/{len(cells)} finished")
+    cols = st.columns(3)
+    for idx, cell in enumerate(cells):
+        col = cols[idx % 3]
+        col.caption(cell["label"])
+        if cell["status"] == "done":
+            show_result(col, idx, cell["result"])
+        else:
+            col.error(cell["error"])
+
+def render_sweep(kind, show_result):
+    sweep = st.session_state['sweeps'].get(kind)
+    if sweep is None:
+        return
+    if any(cell["status"] in ("queued", "running") for cell in sweep["cells"]):
+        st.fragment(_sweep_status, run_every=JOB_REFRESH_SECONDS)(kind)
+    else:
+        _sweep_grid(kind, show_result)
+
+def start_sweep(kind, label, sweep):
+    if not sweep["cells"]:
+        st.error("Enter at least one value for every swept parameter.")
+    elif len(sweep["cells"]) > MAX_SWEEP_SIZE:
+        st.error(f"That sweep has {len(sweep['cells'])} combinations; the limit is {MAX_SWEEP_SIZE}.")
+    else:
+        st.session_state['sweeps'][kind] = sweep
+        submit_job(f"{label} sweep ({len(sweep['cells'])} runs)", sweep_job, sweep)
+        st.info(f"Submitted {len(sweep['cells'])} runs, at most {SWEEP_CONCURRENCY} at a time.")
+
+def submit_api_job(label, fn, url, files, data, on_done, **kwargs):
+    # Identical requests (a double-clicked button, teammates running the same preset) share
+    # one call, whichever session submitted it first
+    fingerprint = request_fingerprint(
+        url, files, data, kwargs.get("accept_header"), kwargs.get("result_url"), credential=api_key
+    )
+    return submit_job(label, fn, url, files=files, data=data, on_done=on_done, fingerprint=fingerprint, **kwargs)
+
+def store_account_details(response):
+    st.session_state['account_info'] = response.json()
+
+def store_account_balance(response):
+    st.session_state['account_credits'] = response.json()['credits']
+
+# Sidebar - User Account
+st.sidebar.markdown("---")
+st.sidebar.header("👤 User Account")
+
+if st.sidebar.button("View Account Details", key="account_details"):
+    submit_job("Account details", api.fetch_account_job, f"{API_BASE}/v1/user/account", on_done=store_account_details)
+if 'account_info' in st.session_state:
+    st.sidebar.success("Account Details:")
+    st.sidebar.json(st.session_state['account_info'])
+
+if st.sidebar.button("View Account Balance", key="account_balance"):
+    submit_job("Account balance", api.fetch_account_job, f"{API_BASE}/v1/user/balance", on_done=store_account_balance)
+if 'account_credits' in st.session_state:
+    st.sidebar.success(f"💰 Credits: {st.session_state['account_credits']}")
+
+render_timer.mark("setup and sidebar")
 
 # Main Tabs
 tab_titles = [
@@ -226,12 +456,15 @@ with tabs[0]:
     with image_subtabs[3]:
         st.subheader("🎨 Interactive Canvas")
         canvas_mode = st.selectbox("Canvas Mode", ["Draw", "Upload Image"], key="canvas_mode")
-        if canvas_mode == "Draw":
+        if canvas_mode == "Draw" and STARTUP_OPTIMIZED and not st.toggle("Load drawing canvas", key="load_canvas"):
+            # The canvas component and its frontend bundle are only loaded once asked for
+            st.caption("The drawing canvas loads when switched on.")
+        elif canvas_mode == "Draw":
             stroke_width = st.slider("Stroke Width", 1, 25, 3)
             stroke_color = st.color_picker("Stroke Color", "#000000")
             bg_color = st.color_picker("Background Color", "#FFFFFF")
             realtime_update = st.checkbox("Update in Real Time", True)
-            canvas_result = st_canvas(
+            canvas_result = lazy_import("streamlit_drawable_canvas").st_canvas(
                 fill_color="rgba(0, 0, 0, 0)",  # Transparent fill
                 stroke_width=stroke_width,
                 stroke_color=stroke_color,
@@ -245,21 +478,21 @@ with tabs[0]:
             )
             if canvas_result.image_data is not None:
                 # Update the current image with the canvas content
-                init_image = Image.fromarray(canvas_result.image_data.astype('uint8'), 'RGBA')
+                init_image = pil_image().fromarray(canvas_result.image_data.astype('uint8'), 'RGBA')
                 st.session_state['current_image'] = init_image
         else:
             uploaded_image = st.file_uploader("Upload an Image", type=["png", "jpg", "jpeg"])
             if uploaded_image:
-                init_image = Image.open(uploaded_image)
+                init_image = pil_image().open(uploaded_image)
                 st.session_state['current_image'] = init_image
-                st.image(init_image, caption="Uploaded Image", use_column_width=True)
+                show_image_preview(st, init_image, caption="Uploaded Image")
 
     # 📝 Text-to-Image Subtab
     with image_subtabs[0]:
         st.subheader("📝 Text-to-Image Generation")
         with st.expander("Generation Settings", expanded=True):
             model_type = st.selectbox("Select Model", [
-                "Stable Image Ultra", "Stable Image Core",
+                AUTO_MODEL, "Stable Image Ultra", "Stable Image Core",
                 "Stable Diffusion 3.5 Large", "Stable Diffusion 3.5 Large Turbo",
                 "Stable Diffusion 3.0 Large", "Stable Diffusion 3.0 Large Turbo", "Stable Diffusion 3.0 Medium"
             ], key="model_type_tti")
@@ -272,7 +505,17 @@ with tabs[0]:
             output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_tti")
 
             # Full parameter control
-            if model_type in ["Stable Image Ultra", "Stable Image Core"]:
+            if model_type == AUTO_MODEL:
+                quality_tier = st.selectbox("Minimum Quality", list(QUALITY_TIERS), index=1, key="quality_tier_tti")
+                max_credits = st.number_input("Max Credits per Image", min_value=1.0, max_value=10.0, value=6.5, step=0.5, key="max_credits_tti")
+                ranked = router.rank(QUALITY_TIERS[quality_tier], max_credits)
+                if ranked:
+                    st.caption(f"Will try {ranked[0]} first, then fail over to: {', '.join(ranked[1:]) or 'none'}")
+                else:
+                    st.warning("No model meets that quality tier within the credit budget.")
+                with st.expander("Model latency and errors"):
+                    show_router_stats()
+            elif model_type in ["Stable Image Ultra", "Stable Image Core"]:
                 # Specific parameters for Ultra and Core
                 if model_type == "Stable Image Ultra":
                     cfg_scale = st.slider("CFG Scale", min_value=0.0, max_value=35.0, value=7.0, key="cfg_scale_tti")
@@ -293,61 +536,52 @@ with tabs[0]:
 
             generate_button = st.button("Generate Image", key="generate_button_tti")
             if generate_button:
-                with st.spinner("Generating image..."):
-                    data = {
-                        "prompt": prompt,
-                        "negative_prompt": negative_prompt,
-                        "aspect_ratio": aspect_ratio,
-                        "seed": seed,
-                        "output_format": output_format,
-                    }
+                data = {
+                    "prompt": prompt,
+                    "negative_prompt": negative_prompt,
+                    "aspect_ratio": aspect_ratio,
+                    "seed": seed,
+                    "output_format": output_format,
+                }
+                if model_type == AUTO_MODEL:
+                    submit_job(
+                        "Text-to-Image (auto)",
+                        api.auto_text_to_image_job,
+                        data,
+                        QUALITY_TIERS[quality_tier],
+                        max_credits,
+                        on_done=display_image,
+                        fingerprint=request_fingerprint(AUTO_MODEL, {}, data, quality_tier, max_credits, credential=api_key),
+                    )
+                else:
                     if model_type == "Stable Image Ultra":
                         data["cfg_scale"] = cfg_scale
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/generate/ultra",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files={"none": ""},
-                            data=data,
-                        )
                     elif model_type == "Stable Image Core":
                         if style_preset != "None":
                             data["style_preset"] = style_preset
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/generate/core",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files={"none": ""},
-                            data=data,
-                        )
                     else:
-                        # Stable Diffusion 3.0 & 3.5
-                        data["model"] = model_type.lower().replace(" ", "-")
                         data["steps"] = steps
                         data["sampler"] = sampler
                         data["cfg_scale"] = cfg_scale
                         data["samples"] = samples
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/generate",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "application/json",
-                            },
-                            files={"none": ""},
-                            data=data,
-                        )
-                    display_image(response)
-                    st.success("Image generated and loaded into the canvas!")
+                    url, data, accept_header = api.text_to_image_request(model_type, data)
+                    submit_api_job(
+                        f"Text-to-Image ({model_type})",
+                        api.post_job,
+                        url,
+                        files={"none": ""},
+                        data=data,
+                        accept_header=accept_header,
+                        on_done=display_image,
+                    )
+                st.info("Image generation queued - the result will load into the canvas when ready.")
+        show_result_grid("tti")
 
     # 🖼️ Image-to-Image Subtab
     with image_subtabs[1]:
         st.subheader("🖼️ Image-to-Image Generation")
         if st.session_state['current_image'] is not None:
-            st.image(st.session_state['current_image'], caption="Current Image", use_column_width=True)
+            show_current_image("iti")
             with st.expander("Generation Settings", expanded=True):
                 model_type = st.selectbox("Select Model", [
                     "Stable Diffusion 3.5 Large", "Stable Diffusion 3.5 Large Turbo",
@@ -366,36 +600,35 @@ with tabs[0]:
 
             generate_button = st.button("Generate Image", key="generate_button_iti")
             if generate_button:
-                with st.spinner("Generating image..."):
-                    data = {
-                        "prompt": prompt,
-                        "negative_prompt": negative_prompt,
-                        "seed": seed,
-                        "output_format": output_format,
-                        "strength": image_strength,
-                        "mode": "image-to-image",
-                        "model": model_type.lower().replace(" ", "-"),
-                        "steps": steps,
-                        "sampler": sampler,
-                        "cfg_scale": cfg_scale,
-                        "samples": samples,
-                    }
-                    buffered = BytesIO()
-                    st.session_state['current_image'].save(buffered, format="PNG")
-                    files = {
-                        "image": buffered.getvalue(),
-                    }
-                    response = requests.post(
-                        "https://api.stability.ai/v2beta/stable-image/generate",
-                        headers={
-                            "Authorization": f"Bearer {api_key}",
-                            "Accept": "application/json",
-                        },
-                        files=files,
-                        data=data,
-                    )
-                    display_image(response)
-                    st.success("Image generated and loaded into the canvas!")
+                data = {
+                    "prompt": prompt,
+                    "negative_prompt": negative_prompt,
+                    "seed": seed,
+                    "output_format": output_format,
+                    "strength": image_strength,
+                    "mode": "image-to-image",
+                    "model": model_type.lower().replace(" ", "-"),
+                    "steps": steps,
+                    "sampler": sampler,
+                    "cfg_scale": cfg_scale,
+                    "samples": samples,
+                }
+                buffered = BytesIO()
+                st.session_state['current_image'].save(buffered, format="PNG")
+                files = {
+                    "image": buffered.getvalue(),
+                }
+                submit_api_job(
+                    f"Image-to-Image ({model_type})",
+                    api.post_job,
+                    f"{API_BASE}/v2beta/stable-image/generate",
+                    files=files,
+                    data=data,
+                    accept_header="application/json",
+                    on_done=display_image,
+                )
+                st.info("Image generation queued - the result will load into the canvas when ready.")
+            show_result_grid("iti")
         else:
             st.warning("Please use the Canvas to draw or upload an image first.")
 
@@ -403,7 +636,7 @@ with tabs[0]:
     with image_subtabs[2]:
         st.subheader("✨ Image Effects")
         if st.session_state['current_image'] is not None:
-            st.image(st.session_state['current_image'], caption="Current Image", use_column_width=True)
+            show_current_image("effects")
             effect_type = st.selectbox("Select Effect", ["Upscale", "Inpaint", "Outpaint", "Erase", "Search and Replace", "Search and Recolor", "Remove Background"], key="effect_type")
             if effect_type == "Upscale":
                 upscale_type = st.selectbox("Upscale Type", ["Fast", "Conservative", "Creative"], key="upscale_type")
@@ -411,26 +644,24 @@ with tabs[0]:
                     output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_upscale")
                     upscale_button = st.button("Upscale Image", key="upscale_button")
                     if upscale_button:
-                        with st.spinner("Upscaling image..."):
-                            buffered = BytesIO()
-                            st.session_state['current_image'].save(buffered, format="PNG")
-                            files = {
-                                "image": buffered.getvalue(),
-                            }
-                            data = {
-                                "output_format": output_format,
-                            }
-                            response = requests.post(
-                                "https://api.stability.ai/v2beta/stable-image/upscale/fast",
-                                headers={
-                                    "Authorization": f"Bearer {api_key}",
-                                    "Accept": "image/*",
-                                },
-                                files=files,
-                                data=data,
-                            )
-                            display_image(response)
-                            st.success("Image upscaled and loaded into the canvas!")
+                        buffered = BytesIO()
+                        st.session_state['current_image'].save(buffered, format="PNG")
+                        files = {
+                            "image": buffered.getvalue(),
+                        }
+                        data = {
+                            "output_format": output_format,
+                        }
+                        submit_api_job(
+                            "Upscale (Fast)",
+                            api.post_job,
+                            f"{API_BASE}/v2beta/stable-image/upscale/fast",
+                            files=files,
+                            data=data,
+                            accept_header="image/*",
+                            on_done=display_image,
+                        )
+                        st.info("Upscale (Fast) queued - the result will load into the canvas when ready.")
                 else:
                     # Full parameter control for Conservative and Creative
                     prompt_upscale = st.text_area("Upscale Prompt", key="upscale_prompt")
@@ -443,43 +674,39 @@ with tabs[0]:
                     output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_upscale")
                     upscale_button = st.button("Upscale Image", key="upscale_button")
                     if upscale_button:
-                        with st.spinner("Upscaling image..."):
-                            buffered = BytesIO()
-                            st.session_state['current_image'].save(buffered, format="PNG")
-                            files = {
-                                "image": buffered.getvalue(),
-                            }
-                            data = {
-                                "prompt": prompt_upscale,
-                                "negative_prompt": negative_prompt_upscale,
-                                "seed": seed_upscale,
-                                "creativity": creativity,
-                                "output_format": output_format,
-                            }
-                            endpoint = "conservative" if upscale_type == "Conservative" else "creative"
-                            response = requests.post(
-                                f"https://api.stability.ai/v2beta/stable-image/upscale/{endpoint}",
-                                headers={
-                                    "Authorization": f"Bearer {api_key}",
-                                },
+                        buffered = BytesIO()
+                        st.session_state['current_image'].save(buffered, format="PNG")
+                        files = {
+                            "image": buffered.getvalue(),
+                        }
+                        data = {
+                            "prompt": prompt_upscale,
+                            "negative_prompt": negative_prompt_upscale,
+                            "seed": seed_upscale,
+                            "creativity": creativity,
+                            "output_format": output_format,
+                        }
+                        if upscale_type == "Creative":
+                            submit_api_job(
+                                "Upscale (Creative)",
+                                api.generation_job,
+                                f"{API_BASE}/v2beta/stable-image/upscale/creative",
                                 files=files,
                                 data=data,
+                                result_url=f"{API_BASE}/v2beta/stable-image/upscale/creative/result",
+                                accept_header="image/*",
+                                on_done=display_image,
                             )
-                            if response.status_code == 200 and upscale_type == "Creative":
-                                generation_id = response.json().get("id")
-                                st.write(f"Generation ID: {generation_id}")
-                                st.write("Fetching upscaled image...")
-                                result_response = start_polling(
-                                    generation_id,
-                                    f"https://api.stability.ai/v2beta/stable-image/upscale/creative/result/{generation_id}",
-                                    accept_header="image/*"
-                                )
-                                if result_response:
-                                    display_image(result_response)
-                                    st.success("Image upscaled and loaded into the canvas!")
-                            else:
-                                display_image(response)
-                                st.success("Image upscaled and loaded into the canvas!")
+                        else:
+                            submit_api_job(
+                                "Upscale (Conservative)",
+                                api.post_job,
+                                f"{API_BASE}/v2beta/stable-image/upscale/conservative",
+                                files=files,
+                                data=data,
+                                on_done=display_image,
+                            )
+                        st.info("Upscale queued - the result will load into the canvas when ready.")
             elif effect_type == "Inpaint":
                 mask_file = st.file_uploader("Upload Mask Image", type=["png", "jpg", "jpeg", "webp"], key="inpaint_mask")
                 grow_mask = st.number_input("Grow Mask (pixels)", min_value=0, max_value=100, value=5, key="grow_mask")
@@ -489,31 +716,29 @@ with tabs[0]:
                 output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_inpaint")
                 inpaint_button = st.button("Inpaint Image", key="inpaint_button")
                 if inpaint_button and mask_file:
-                    with st.spinner("Inpainting image..."):
-                        buffered = BytesIO()
-                        st.session_state['current_image'].save(buffered, format="PNG")
-                        files = {
-                            "image": buffered.getvalue(),
-                            "mask": mask_file.getvalue(),
-                        }
-                        data = {
-                            "prompt": prompt,
-                            "negative_prompt": negative_prompt,
-                            "seed": seed,
-                            "grow_mask": grow_mask,
-                            "output_format": output_format,
-                        }
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/edit/inpaint",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files=files,
-                            data=data,
-                        )
-                    display_image(response)
-                    st.success("Image inpainted and loaded into the canvas!")
+                    buffered = BytesIO()
+                    st.session_state['current_image'].save(buffered, format="PNG")
+                    files = {
+                        "image": buffered.getvalue(),
+                        "mask": mask_file.getvalue(),
+                    }
+                    data = {
+                        "prompt": prompt,
+                        "negative_prompt": negative_prompt,
+                        "seed": seed,
+                        "grow_mask": grow_mask,
+                        "output_format": output_format,
+                    }
+                    submit_api_job(
+                        "Inpaint",
+                        api.post_job,
+                        f"{API_BASE}/v2beta/stable-image/edit/inpaint",
+                        files=files,
+                        data=data,
+                        accept_header="image/*",
+                        on_done=display_image,
+                    )
+                    st.info("Inpaint queued - the result will load into the canvas when ready.")
             elif effect_type == "Outpaint":
                 prompt = st.text_area("Prompt", key="prompt_outpaint")
                 negative_prompt = st.text_area("Negative Prompt", key="negative_prompt_outpaint")
@@ -526,34 +751,32 @@ with tabs[0]:
                 creativity = st.slider("Creativity", min_value=0.0, max_value=1.0, value=0.5, key="creativity_outpaint")
                 outpaint_button = st.button("Outpaint Image", key="outpaint_button")
                 if outpaint_button:
-                    with st.spinner("Outpainting image..."):
-                        buffered = BytesIO()
-                        st.session_state['current_image'].save(buffered, format="PNG")
-                        files = {
-                            "image": buffered.getvalue(),
-                        }
-                        data = {
-                            "prompt": prompt,
-                            "negative_prompt": negative_prompt,
-                            "seed": seed,
-                            "left": left,
-                            "right": right,
-                            "up": up,
-                            "down": down,
-                            "creativity": creativity,
-                            "output_format": output_format,
-                        }
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/edit/outpaint",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files=files,
-                            data=data,
-                        )
-                    display_image(response)
-                    st.success("Image outpainted and loaded into the canvas!")
+                    buffered = BytesIO()
+                    st.session_state['current_image'].save(buffered, format="PNG")
+                    files = {
+                        "image": buffered.getvalue(),
+                    }
+                    data = {
+                        "prompt": prompt,
+                        "negative_prompt": negative_prompt,
+                        "seed": seed,
+                        "left": left,
+                        "right": right,
+                        "up": up,
+                        "down": down,
+                        "creativity": creativity,
+                        "output_format": output_format,
+                    }
+                    submit_api_job(
+                        "Outpaint",
+                        api.post_job,
+                        f"{API_BASE}/v2beta/stable-image/edit/outpaint",
+                        files=files,
+                        data=data,
+                        accept_header="image/*",
+                        on_done=display_image,
+                    )
+                    st.info("Outpaint queued - the result will load into the canvas when ready.")
             elif effect_type == "Erase":
                 mask_file = st.file_uploader("Upload Mask Image", type=["png", "jpg", "jpeg", "webp"], key="erase_mask")
                 grow_mask = st.number_input("Grow Mask (pixels)", min_value=0, max_value=20, value=5, key="erase_grow_mask")
@@ -561,29 +784,27 @@ with tabs[0]:
                 output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_erase")
                 erase_button = st.button("Erase", key="erase_button")
                 if erase_button and mask_file:
-                    with st.spinner("Erasing image..."):
-                        buffered = BytesIO()
-                        st.session_state['current_image'].save(buffered, format="PNG")
-                        files = {
-                            "image": buffered.getvalue(),
-                            "mask": mask_file.getvalue(),
-                        }
-                        data = {
-                            "grow_mask": grow_mask,
-                            "seed": seed,
-                            "output_format": output_format,
-                        }
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/edit/erase",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files=files,
-                            data=data,
-                        )
-                    display_image(response)
-                    st.success("Image erased and loaded into the canvas!")
+                    buffered = BytesIO()
+                    st.session_state['current_image'].save(buffered, format="PNG")
+                    files = {
+                        "image": buffered.getvalue(),
+                        "mask": mask_file.getvalue(),
+                    }
+                    data = {
+                        "grow_mask": grow_mask,
+                        "seed": seed,
+                        "output_format": output_format,
+                    }
+                    submit_api_job(
+                        "Erase",
+                        api.post_job,
+                        f"{API_BASE}/v2beta/stable-image/edit/erase",
+                        files=files,
+                        data=data,
+                        accept_header="image/*",
+                        on_done=display_image,
+                    )
+                    st.info("Erase queued - the result will load into the canvas when ready.")
             elif effect_type == "Search and Replace":
                 search_prompt = st.text_input("Search Prompt", key="search_replace_search_prompt")
                 prompt = st.text_area("Replace Prompt", key="prompt_search_replace")
@@ -593,31 +814,29 @@ with tabs[0]:
                 output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_search_replace")
                 replace_button = st.button("Search and Replace", key="search_replace_button")
                 if replace_button:
-                    with st.spinner("Processing image..."):
-                        buffered = BytesIO()
-                        st.session_state['current_image'].save(buffered, format="PNG")
-                        files = {
-                            "image": buffered.getvalue(),
-                        }
-                        data = {
-                            "prompt": prompt,
-                            "search_prompt": search_prompt,
-                            "negative_prompt": negative_prompt,
-                            "grow_mask": grow_mask,
-                            "seed": seed,
-                            "output_format": output_format,
-                        }
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/edit/search-and-replace",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files=files,
-                            data=data,
-                        )
-                    display_image(response)
-                    st.success("Image processed and loaded into the canvas!")
+                    buffered = BytesIO()
+                    st.session_state['current_image'].save(buffered, format="PNG")
+                    files = {
+                        "image": buffered.getvalue(),
+                    }
+                    data = {
+                        "prompt": prompt,
+                        "search_prompt": search_prompt,
+                        "negative_prompt": negative_prompt,
+                        "grow_mask": grow_mask,
+                        "seed": seed,
+                        "output_format": output_format,
+                    }
+                    submit_api_job(
+                        "Search and Replace",
+                        api.post_job,
+                        f"{API_BASE}/v2beta/stable-image/edit/search-and-replace",
+                        files=files,
+                        data=data,
+                        accept_header="image/*",
+                        on_done=display_image,
+                    )
+                    st.info("Search and Replace queued - the result will load into the canvas when ready.")
             elif effect_type == "Search and Recolor":
                 select_prompt = st.text_input("Select Prompt", key="search_recolor_select_prompt")
                 prompt = st.text_area("Recolor Prompt", key="prompt_search_recolor")
@@ -627,58 +846,56 @@ with tabs[0]:
                 output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_search_recolor")
                 recolor_button = st.button("Search and Recolor", key="search_recolor_button")
                 if recolor_button:
-                    with st.spinner("Processing image..."):
-                        buffered = BytesIO()
-                        st.session_state['current_image'].save(buffered, format="PNG")
-                        files = {
-                            "image": buffered.getvalue(),
-                        }
-                        data = {
-                            "prompt": prompt,
-                            "select_prompt": select_prompt,
-                            "negative_prompt": negative_prompt,
-                            "grow_mask": grow_mask,
-                            "seed": seed,
-                            "output_format": output_format,
-                        }
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/edit/search-and-recolor",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files=files,
-                            data=data,
-                        )
-                    display_image(response)
-                    st.success("Image recolored and loaded into the canvas!")
+                    buffered = BytesIO()
+                    st.session_state['current_image'].save(buffered, format="PNG")
+                    files = {
+                        "image": buffered.getvalue(),
+                    }
+                    data = {
+                        "prompt": prompt,
+                        "select_prompt": select_prompt,
+                        "negative_prompt": negative_prompt,
+                        "grow_mask": grow_mask,
+                        "seed": seed,
+                        "output_format": output_format,
+                    }
+                    submit_api_job(
+                        "Search and Recolor",
+                        api.post_job,
+                        f"{API_BASE}/v2beta/stable-image/edit/search-and-recolor",
+                        files=files,
+                        data=data,
+                        accept_header="image/*",
+                        on_done=display_image,
+                    )
+                    st.info("Search and Recolor queued - the result will load into the canvas when ready.")
             elif effect_type == "Remove Background":
                 output_format = st.selectbox("Output Format", ["png", "jpeg", "webp"], key="output_format_remove_bg")
                 remove_bg_button = st.button("Remove Background", key="remove_bg_button")
                 if remove_bg_button:
-                    with st.spinner("Removing background..."):
-                        buffered = BytesIO()
-                        st.session_state['current_image'].save(buffered, format="PNG")
-                        files = {
-                            "image": buffered.getvalue(),
-                        }
-                        data = {
-                            "output_format": output_format,
-                        }
-                        response = requests.post(
-                            "https://api.stability.ai/v2beta/stable-image/edit/remove-background",
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Accept": "image/*",
-                            },
-                            files=files,
-                            data=data,
-                        )
-                    display_image(response)
-                    st.success("Background removed and image loaded into the canvas!")
+                    buffered = BytesIO()
+                    st.session_state['current_image'].save(buffered, format="PNG")
+                    files = {
+                        "image": buffered.getvalue(),
+                    }
+                    data = {
+                        "output_format": output_format,
+                    }
+                    submit_api_job(
+                        "Remove Background",
+                        api.post_job,
+                        f"{API_BASE}/v2beta/stable-image/edit/remove-background",
+                        files=files,
+                        data=data,
+                        accept_header="image/*",
+                        on_done=display_image,
+                    )
+                    st.info("Remove Background queued - the result will load into the canvas when ready.")
         else:
             st.warning("Please use the Canvas to draw or upload an image first.")
 
+render_timer.mark("image tab")
+
 # 🎞️ Video Generation Tab
 with tabs[1]:
     st.header("🎞️ Video Generation")
@@ -686,44 +903,63 @@ with tabs[1]:
     with st.expander("Video Generation Settings", expanded=True):
         image_file = st.file_uploader("Upload Initial Image", type=["png", "jpg", "jpeg"], key="video_image")
         if image_file:
-            image = Image.open(image_file)
-            st.image(image, caption="Initial Image", use_column_width=True)
-        cfg_scale = st.number_input("CFG Scale", min_value=0.0, max_value=10.0, value=1.8, key="video_cfg_scale")
-        motion_bucket_id = st.number_input("Motion Bucket ID", min_value=1, max_value=255, value=127, key="video_motion_bucket")
-        seed = st.number_input("Seed (0 for random)", min_value=0, max_value=4294967294, value=0, key="video_seed")
-    video_button = st.button("Generate Video", key="video_button")
-
-    if video_button and image_file:
-        with st.spinner("Generating video..."):
-            files = {
-                "image": image_file.getvalue(),
-            }
-            data = {
-                "cfg_scale": cfg_scale,
-                "motion_bucket_id": motion_bucket_id,
-                "seed": seed,
+            show_preview(st, bytes_digest(image_file.getvalue()), lambda: pil_image().open(image_file), caption="Initial Image")
+        sweep_video = st.checkbox("🧪 Parameter sweep", key="video_sweep", help="Try every combination of the values below.")
+        if sweep_video:
+            cfg_scale_values = st.text_input("CFG Scale values", "1.8, 2.5, 3.5", key="video_sweep_cfg_scale", help="Comma-separated values or an inclusive start:stop:step range.")
+            motion_bucket_values = st.text_input("Motion Bucket ID values", "64:192:64", key="video_sweep_motion_bucket", help="Comma-separated values or an inclusive start:stop:step range.")
+        else:
+            cfg_scale = st.number_input("CFG Scale", min_value=0.0, max_value=10.0, value=1.8, key="video_cfg_scale")
+            motion_bucket_id = st.number_input("Motion Bucket ID", min_value=1, max_value=255, value=127, key="video_motion_bucket")
+        seed = st.number_input("Seed (0 for random)", min_value=0, max_value=4294967294, value=0, key="video_seed", help="Use a fixed seed when sweeping so only the swept parameters change.")
+    video_button = st.button("Run Sweep" if sweep_video else "Generate Video", key="video_button")
+
+    if video_button and image_file and sweep_video:
+        try:
+            grid = {
+                "cfg_scale": parse_sweep_values(cfg_scale_values, float),
+                "motion_bucket_id": parse_sweep_values(motion_bucket_values, int),
             }
-            response = requests.post(
-                "https://api.stability.ai/v2beta/image-to-video",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                },
-                files=files,
-                data=data,
-            )
-        if response.status_code == 200:
-            generation_id = response.json().get("id")
-            st.write(f"Generation ID: {generation_id}")
-            st.write("Fetching video...")
-            result_response = start_polling(
-                generation_id,
-                f"https://api.stability.ai/v2beta/image-to-video/result/{generation_id}",
-                accept_header="video/*"
-            )
-            if result_response:
-                display_video(result_response)
+        except ValueError as e:
+            st.error(f"Invalid sweep values: {e}")
         else:
-            st.error(f"Error: {response.status_code} - {response.text}")
+            start_sweep("video", "Image-to-Video", new_sweep(
+                f"{API_BASE}/v2beta/image-to-video",
+                {"image": image_file.getvalue()},
+                {"seed": seed},
+                grid,
+                result_url=f"{API_BASE}/v2beta/image-to-video/result",
+                accept_header="video/*",
+                save_prefix="generated_video",
+                ext="mp4",
+            ))
+    elif video_button and image_file:
+        files = {
+            "image": image_file.getvalue(),
+        }
+        data = {
+            "cfg_scale": cfg_scale,
+            "motion_bucket_id": motion_bucket_id,
+            "seed": seed,
+        }
+        submit_api_job(
+            "Image-to-Video",
+            api.generation_job,
+            f"{API_BASE}/v2beta/image-to-video",
+            files=files,
+            data=data,
+            result_url=f"{API_BASE}/v2beta/image-to-video/result",
+            accept_header="video/*",
+            on_done=display_video,
+        )
+        st.info("Video generation queued - track its progress in the sidebar.")
+
+    render_sweep("video", lambda col, idx, video_bytes: col.video(video_bytes))
+
+    if st.session_state['current_video'] is not None:
+        st.video(st.session_state['current_video'])
+
+render_timer.mark("video tab")
 
 # 🔷 3D Generation Tab
 with tabs[2]:
@@ -731,82 +967,166 @@ with tabs[2]:
     with st.expander("3D Model Generation Settings", expanded=True):
         image_file = st.file_uploader("Upload Image for 3D Model", type=["png", "jpg", "jpeg", "webp"], key="3d_image")
         if image_file:
-            image = Image.open(image_file)
-            st.image(image, caption="Input Image", use_column_width=True)
-        texture_resolution = st.selectbox("Texture Resolution", [512, 1024, 2048], key="3d_texture_resolution")
+            show_preview(st, bytes_digest(image_file.getvalue()), lambda: pil_image().open(image_file), caption="Input Image")
+        sweep_3d = st.checkbox("🧪 Parameter sweep", key="3d_sweep", help="Try every combination of the values below.")
+        if sweep_3d:
+            texture_resolution_values = st.multiselect("Texture Resolutions", [512, 1024, 2048], default=[512, 1024], key="3d_sweep_texture_resolution")
+            remesh_values = st.multiselect("Remesh", ["none", "quad", "triangle"], default=["none", "triangle"], key="3d_sweep_remesh")
+            vertex_count_values = st.text_input("Vertex Count values", "-1, 5000, 10000", key="3d_sweep_vertex_count", help="Comma-separated values or an inclusive start:stop:step range.")
+        else:
+            texture_resolution = st.selectbox("Texture Resolution", [512, 1024, 2048], key="3d_texture_resolution")
         foreground_ratio = st.slider("Foreground Ratio", min_value=0.1, max_value=1.0, value=0.85, key="3d_foreground_ratio")
-        remesh = st.selectbox("Remesh", ["none", "quad", "triangle"], key="3d_remesh")
-        vertex_count = st.number_input("Vertex Count (-1 for default)", min_value=-1, max_value=20000, value=-1, key="3d_vertex_count")
-    model_button = st.button("Generate 3D Model", key="3d_model_button")
-
-    if model_button and image_file:
-        with st.spinner("Generating 3D model..."):
-            files = {
-                "image": image_file.getvalue(),
-            }
-            data = {
-                "texture_resolution": texture_resolution,
-                "foreground_ratio": foreground_ratio,
-                "remesh": remesh,
-                "vertex_count": vertex_count,
+        if not sweep_3d:
+            remesh = st.selectbox("Remesh", ["none", "quad", "triangle"], key="3d_remesh")
+            vertex_count = st.number_input("Vertex Count (-1 for default)", min_value=-1, max_value=20000, value=-1, key="3d_vertex_count")
+    model_button = st.button("Run Sweep" if sweep_3d else "Generate 3D Model", key="3d_model_button")
+
+    if model_button and image_file and sweep_3d:
+        try:
+            grid = {
+                "texture_resolution": texture_resolution_values,
+                "remesh": remesh_values,
+                "vertex_count": parse_sweep_values(vertex_count_values, int),
             }
-            response = requests.post(
-                "https://api.stability.ai/v2beta/3d/stable-fast-3d",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                },
-                files=files,
-                data=data,
-            )
-        display_3d_model(response)
+        except ValueError as e:
+            st.error(f"Invalid sweep values: {e}")
+        else:
+            start_sweep("3d", "3D Model", new_sweep(
+                f"{API_BASE}/v2beta/3d/stable-fast-3d",
+                {"image": image_file.getvalue()},
+                {"foreground_ratio": foreground_ratio},
+                grid,
+                save_prefix="generated_model",
+                ext="glb",
+            ))
+    elif model_button and image_file:
+        files = {
+            "image": image_file.getvalue(),
+        }
+        data = {
+            "texture_resolution": texture_resolution,
+            "foreground_ratio": foreground_ratio,
+            "remesh": remesh,
+            "vertex_count": vertex_count,
+        }
+        submit_api_job(
+            "3D Model",
+            api.post_job,
+            f"{API_BASE}/v2beta/3d/stable-fast-3d",
+            files=files,
+            data=data,
+            on_done=display_3d_model,
+        )
+        st.info("3D model generation queued - track its progress in the sidebar.")
+
+    def show_sweep_model(col, idx, glb_data):
+        # The viewer is heavy, so only build it for the models being compared
+        if col.checkbox("View model", key=f"3d_sweep_view_{idx}"):
+            with col:
+                show_3d_model(glb_data)
+
+    render_sweep("3d", show_sweep_model)
+
+    if st.session_state['current_model'] is not None:
+        show_3d_model(st.session_state['current_model'])
+
+render_timer.mark("3D tab")
 
 # 📁 File Management Tab
 with tabs[3]:
     st.header("📁 File Management")
     st.subheader("Your Generated Files")
 
-    # List all files in the 'generated_images' directory
-    files = os.listdir("generated_images")
-    images = [file for file in files if file.endswith(('.png', '.jpg', '.jpeg', '.webp'))]
-    videos = [file for file in files if file.endswith('.mp4')]
-    models = [file for file in files if file.endswith('.glb')]
+    st.caption(f"Workspace: {workspace} - {output_store.usage() / (1024 * 1024):.1f} MB used by all workspaces")
 
-    if images:
-        st.subheader("Images")
-        cols = st.columns(4)
-        for idx, img_file in enumerate(images):
-            img_path = os.path.join("generated_images", img_file)
-            img = Image.open(img_path)
-            cols[idx % 4].image(img, caption=img_file)
-    else:
-        st.write("No images found.")
-
-    if videos:
-        st.subheader("Videos")
-        for video_file in videos:
-            video_path = os.path.join("generated_images", video_file)
-            video_bytes = open(video_path, 'rb').read()
-            st.video(video_bytes)
+    # Listing and thumbnails are the heaviest part of a run, so they wait until asked for
+    if STARTUP_OPTIMIZED and not st.toggle("Show files", key="show_files"):
+        st.caption("Files load when shown.")
     else:
-        st.write("No videos found.")
-
-    if models:
-        st.subheader("3D Models")
-        for model_file in models:
-            model_path = os.path.join("generated_images", model_file)
-            glb_data = open(model_path, 'rb').read()
-            b64_glb = base64.b64encode(glb_data).decode("utf-8")
-            st.components.v1.html(
-                f"""
-                <model-viewer src="data:model/gltf-binary;base64,{b64_glb}"
-                              style="width: 100%; height: 600px;"
-                              autoplay
-                              camera-controls
-                              ar>
-                </model-viewer>
-                <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
-                """,
-                height=600,
-            )
-    else:
-        st.write("No 3D models found.")
+        # Search this workspace's files through the metadata index
+        with st.expander("🔍 Search", expanded=False):
+            search_models, search_endpoints = output_store.facets(workspace)
+            search_text = st.text_input("Prompt words", key="search_text", help="Finds prompts with a word starting with each of these, e.g. \"cyber\" matches \"cyberpunk\".")
+            search_model = st.selectbox("Model", ["Any"] + search_models, key="search_model")
+            search_endpoint = st.selectbox("Endpoint", ["Any"] + search_endpoints, key="search_endpoint")
+            search_seed = st.text_input("Seed", key="search_seed", help="Leave empty to match any seed.")
+            search_dates = st.date_input("Created between", value=(), key="search_dates")
+        since = until = None
+        if len(search_dates) > 0:
+            since = datetime.datetime.combine(search_dates[0], datetime.time.min).timestamp()
+        if len(search_dates) > 1:
+            until = datetime.datetime.combine(search_dates[1] + datetime.timedelta(days=1), datetime.time.min).timestamp()
+        matches = output_store.search(
+            workspace,
+            text=search_text,
+            model=None if search_model == "Any" else search_model,
+            endpoint=None if search_endpoint == "Any" else search_endpoint,
+            seed=int(search_seed) if search_seed.strip().isdigit() else None,
+            since=since,
+            until=until,
+        )
+        images = [file for file in matches if file.endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+        videos = [file for file in matches if file.endswith('.mp4')]
+        models = [file for file in matches if file.endswith('.glb')]
+
+        if images:
+            st.subheader("Images")
+            cols = st.columns(4)
+            for idx, img_file in enumerate(images):
+                # File names are content hashes, so a cached thumbnail is used without reading the file
+                try:
+                    show_preview(
+                        cols[idx % 4],
+                        img_file,
+                        lambda img_file=img_file: pil_image().open(BytesIO(output_store.read(workspace, img_file))),
+                        width=THUMBNAIL_WIDTH,
+                        caption=img_file,
+                        # A cached thumbnail skips the read, but viewing still counts as use for eviction
+                        on_hit=lambda img_file=img_file: output_store.touch(workspace, img_file),
+                    )
+                except AssetNotFoundError:
+                    # Evicted since it was listed; one missing file shouldn't stop the page
+                    cols[idx % 4].warning(f"{img_file} is no longer stored.")
+                    continue
+                show_full_resolution_download(
+                    cols[idx % 4], img_file, lambda img_file=img_file: output_store.read(workspace, img_file), img_file
+                )
+                show_reproduce_button(cols[idx % 4], img_file)
+        else:
+            st.write("No images found.")
+
+        if videos:
+            st.subheader("Videos")
+            for video_file in videos:
+                try:
+                    video_bytes = output_store.read(workspace, video_file)
+                except AssetNotFoundError:
+                    st.warning(f"{video_file} is no longer stored.")
+                    continue
+                st.video(video_bytes)
+                show_reproduce_button(st, video_file)
+        else:
+            st.write("No videos found.")
+
+        if models:
+            st.subheader("3D Models")
+            for model_file in models:
+                try:
+                    glb_data = output_store.read(workspace, model_file)
+                except AssetNotFoundError:
+                    st.warning(f"{model_file} is no longer stored.")
+                    continue
+                show_3d_model(glb_data)
+                show_reproduce_button(st, model_file)
+        else:
+            st.write("No 3D models found.")
+render_timer.mark("file management tab")
+
+# Background jobs
+with st.sidebar:
+    st.markdown("---")
+    render_jobs()
+render_timer.mark("jobs panel")
+
+if STARTUP_OPTIMIZED:
+    show_startup_timings(st.sidebar, render_timer)
@@ -0,0 +1,392 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+OUTPUT_ROOT = "generated_images"
+# Total size of everything in the store before least recently used files are evicted
+OUTPUT_QUOTA_MB = int(os.getenv("OUTPUT_QUOTA_MB", "2048"))
+EVICT_INTERVAL_SECONDS = 30
+# "local" keeps files under OUTPUT_ROOT, "s3" writes them to any S3-compatible bucket (AWS, MinIO, ...)
+OUTPUT_BACKEND = os.getenv("OUTPUT_BACKEND", "local")
+# Writes waiting for the background writer; save() blocks once this many are queued
+WRITE_QUEUE_SIZE = int(os.getenv("OUTPUT_WRITE_QUEUE_SIZE", "64"))
+WRITER_THREADS = int(os.getenv("OUTPUT_WRITER_THREADS", "2"))
+
+
+def safe_namespace(name):
+    # Namespaces become directory names, so keep them to a harmless character set
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name.strip())[:64] or "default"
+
+
+class AssetNotFoundError(FileNotFoundError):
+    # Raised by every backend for a missing key, e.g. a file evicted after it was listed
+    pass
+
+
+class LocalBackend:
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, key, data):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.root, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise AssetNotFoundError(key) from None
+
+    def keys(self):
+        keys = set()
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                keys.add(os.path.relpath(os.path.join(directory, file), self.root).replace(os.sep, "/"))
+        return keys
+
+    def delete(self, key):
+        try:
+            os.remove(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Backend:
+    def __init__(self, bucket, prefix="", endpoint_url=None):
+        # Only needed when OUTPUT_BACKEND=s3, so boto3 is not a hard requirement
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def get(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            raise AssetNotFoundError(key) from None
+
+    def keys(self):
+        keys = set()
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix):
+            keys.update(item["Key"][len(self.prefix):] for item in page.get("Contents", []))
+        return keys
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+class OutputStore:
+    def __init__(self, root, quota_bytes, backend):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.backend = backend
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._touched = {}
+        # Bytes that are indexed but not yet written, so they can be read back straight away
+        self._pending = {}
+        self._writes = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        # save() commits on the request path; with WAL a commit doesn't wait for an fsync
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS assets (
+                namespace TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, name)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS assets_last_access ON assets (last_access)")
+        # How each asset was made: enough to search for it and to re-issue the exact request
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS asset_metadata (
+                namespace TEXT NOT NULL,
+                name TEXT NOT NULL,
+                endpoint TEXT,
+                model TEXT,
+                seed INTEGER,
+                prompt TEXT,
+                request TEXT,
+                PRIMARY KEY (namespace, name)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS asset_metadata_model ON asset_metadata (namespace, model)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS asset_metadata_seed ON asset_metadata (namespace, seed)")
+        try:
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS asset_prompts USING fts5(namespace UNINDEXED, name UNINDEXED, prompt)"
+            )
+            self._fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5, fall back to substring matching
+            self._fts = False
+        self._db.commit()
+        self._evict_needed = threading.Event()
+        self._evict_needed.set()
+        threading.Thread(target=self._evict_loop, name="output-evictor", daemon=True).start()
+        for idx in range(WRITER_THREADS):
+            threading.Thread(target=self._write_loop, name=f"output-writer-{idx}", daemon=True).start()
+
+    def save(self, namespace, data, prefix, ext, metadata=None):
+        # Content-hashed names never collide, and saving the same bytes twice is a no-op.
+        # The write itself happens in the background; this only blocks when the write queue is full.
+        name = f"{prefix}_{hashlib.sha256(data).hexdigest()[:16]}.{ext}"
+        now = time.time()
+        with self._lock:
+            exists = self._db.execute(
+                "SELECT 1 FROM assets WHERE namespace = ? AND name = ?", (namespace, name)
+            ).fetchone()
+            self._db.execute(
+                "INSERT INTO assets (namespace, name, size, created, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, name) DO UPDATE SET last_access = excluded.last_access",
+                (namespace, name, len(data), now, now),
+            )
+            if metadata:
+                self._save_metadata(namespace, name, metadata)
+            self._db.commit()
+            if not exists:
+                self._pending[(namespace, name)] = data
+        if not exists:
+            self._writes.put((namespace, name, data))
+        return name
+
+    def _save_metadata(self, namespace, name, metadata):
+        self._db.execute(
+            "INSERT OR REPLACE INTO asset_metadata (namespace, name, endpoint, model, seed, prompt, request) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                namespace,
+                name,
+                metadata.get("endpoint"),
+                metadata.get("model"),
+                metadata.get("seed"),
+                metadata.get("prompt"),
+                json.dumps(metadata.get("request")),
+            ),
+        )
+        if self._fts:
+            self._db.execute("DELETE FROM asset_prompts WHERE namespace = ? AND name = ?", (namespace, name))
+            self._db.execute(
+                "INSERT INTO asset_prompts (namespace, name, prompt) VALUES (?, ?, ?)",
+                (namespace, name, metadata.get("prompt") or ""),
+            )
+
+    def list(self, namespace, extensions=None):
+        return self.search(namespace, extensions=extensions)
+
+    def search(self, namespace, text="", model=None, endpoint=None, seed=None, since=None, until=None, extensions=None):
+        # Newest first, answered from the index without touching other namespaces or reading any files
+        query = (
+            "SELECT a.name FROM assets a LEFT JOIN asset_metadata m "
+            "ON m.namespace = a.namespace AND m.name = a.name WHERE a.namespace = ?"
+        )
+        params = [namespace]
+        if text.strip():
+            # Every word must start a word of the prompt, so "cyber" finds "cyberpunk"
+            if self._fts:
+                # Quote every word so user input can't be parsed as FTS syntax; words are ANDed
+                match = " ".join('"' + word.replace('"', '""') + '"*' for word in text.split())
+                query += " AND a.name IN (SELECT name FROM asset_prompts WHERE asset_prompts MATCH ? AND namespace = ?)"
+                params += [match, namespace]
+            else:
+                for word in text.split():
+                    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                    query += " AND ' ' || m.prompt LIKE ? ESCAPE '\\'"
+                    params.append(f"% {escaped}%")
+        if model:
+            query += " AND m.model = ?"
+            params.append(model)
+        if endpoint:
+            query += " AND m.endpoint = ?"
+            params.append(endpoint)
+        if seed is not None:
+            query += " AND m.seed = ?"
+            params.append(seed)
+        if since is not None:
+            query += " AND a.created >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND a.created < ?"
+            params.append(until)
+        query += " ORDER BY a.created DESC"
+        with self._lock:
+            names = [row[0] for row in self._db.execute(query, params)]
+        if extensions:
+            names = [name for name in names if name.endswith(extensions)]
+        return names
+
+    def metadata(self, namespace, name):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT endpoint, model, seed, prompt, request FROM asset_metadata WHERE namespace = ? AND name = ?",
+                (namespace, name),
+            ).fetchone()
+        if row is None:
+            return None
+        endpoint, model, seed, prompt, request = row
+        return {"endpoint": endpoint, "model": model, "seed": seed, "prompt": prompt, "request": json.loads(request)}
+
+    def facets(self, namespace):
+        # Distinct models and endpoints in a namespace, for search filters
+        with self._lock:
+            models = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT model FROM asset_metadata WHERE namespace = ? AND model IS NOT NULL ORDER BY model",
+                (namespace,),
+            )]
+            endpoints = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT endpoint FROM asset_metadata WHERE namespace = ? AND endpoint IS NOT NULL ORDER BY endpoint",
+                (namespace,),
+            )]
+        return models, endpoints
+
+    def touch(self, namespace, name):
+        # Count an access without reading the file; written with the next eviction pass
+        with self._lock:
+            self._touched[(namespace, name)] = time.time()
+
+    def read(self, namespace, name):
+        # Access times are batched and written by the evictor thread
+        self.touch(namespace, name)
+        with self._lock:
+            data = self._pending.get((namespace, name))
+        if data is None:
+            try:
+                data = self.backend.get(f"{namespace}/{name}")
+            except AssetNotFoundError:
+                # The row outlived its file, so stop listing it
+                with self._lock:
+                    self._delete_rows([(namespace, name)])
+                    self._db.commit()
+                raise
+        return data
+
+    def usage(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM assets").fetchone()[0]
+
+    def flush(self):
+        # Wait for every queued write to reach the backend
+        self._writes.join()
+
+    def evict(self):
+        with self._lock:
+            if self._touched:
+                self._db.executemany(
+                    "UPDATE assets SET last_access = ? WHERE namespace = ? AND name = ?",
+                    [(last_access, namespace, name) for (namespace, name), last_access in self._touched.items()],
+                )
+                self._touched = {}
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM assets").fetchone()[0]
+            evicted = []
+            if total > self.quota_bytes:
+                for namespace, name, size in self._db.execute(
+                    "SELECT namespace, name, size FROM assets ORDER BY last_access"
+                ):
+                    if total <= self.quota_bytes:
+                        break
+                    # Never evict something the writer hasn't stored yet
+                    if (namespace, name) in self._pending:
+                        continue
+                    evicted.append((namespace, name))
+                    total -= size
+                self._delete_rows(evicted)
+            self._db.commit()
+        for namespace, name in evicted:
+            self.backend.delete(f"{namespace}/{name}")
+
+    def reconcile(self):
+        # Drop rows whose write never happened, e.g. queued when the server stopped. Rows
+        # newer than the listing may not be stored yet, so they are left alone.
+        started = time.time()
+        stored = self.backend.keys()
+        with self._lock:
+            orphans = [
+                (namespace, name)
+                for namespace, name in self._db.execute("SELECT namespace, name FROM assets WHERE created < ?", (started,))
+                if f"{namespace}/{name}" not in stored and (namespace, name) not in self._pending
+            ]
+            self._delete_rows(orphans)
+            self._db.commit()
+        if orphans:
+            print(f"Removed {len(orphans)} index entries without a stored file")
+
+    def _delete_rows(self, keys):
+        self._db.executemany("DELETE FROM assets WHERE namespace = ? AND name = ?", keys)
+        self._db.executemany("DELETE FROM asset_metadata WHERE namespace = ? AND name = ?", keys)
+        if self._fts:
+            self._db.executemany("DELETE FROM asset_prompts WHERE namespace = ? AND name = ?", keys)
+
+    def _write_loop(self):
+        while True:
+            namespace, name, data = self._writes.get()
+            try:
+                self.backend.put(f"{namespace}/{name}", data)
+            except Exception as e:
+                print(f"Saving {namespace}/{name} failed: {e}")
+                with self._lock:
+                    self._delete_rows([(namespace, name)])
+                    self._db.commit()
+            finally:
+                with self._lock:
+                    self._pending.pop((namespace, name), None)
+                self._writes.task_done()
+                self._evict_needed.set()
+
+    def _evict_loop(self):
+        try:
+            self.reconcile()
+        except Exception as e:
+            print(f"Output index check failed: {e}")
+        while True:
+            self._evict_needed.wait(EVICT_INTERVAL_SECONDS)
+            self._evict_needed.clear()
+            try:
+                self.evict()
+            except Exception as e:
+                print(f"Output eviction failed: {e}")
+
+
+def create_backend():
+    if OUTPUT_BACKEND == "s3":
+        return S3Backend(
+            os.environ["OUTPUT_S3_BUCKET"],
+            prefix=os.getenv("OUTPUT_S3_PREFIX", ""),
+            endpoint_url=os.getenv("OUTPUT_S3_ENDPOINT_URL"),
+        )
+    return LocalBackend(OUTPUT_ROOT)
+
+
+@st.cache_resource
+def get_output_store():
+    # One store (with its writer and eviction threads) per server process
+    store = OutputStore(OUTPUT_ROOT, OUTPUT_QUOTA_MB * 1024 * 1024, create_backend())
+    # Don't lose queued writes when the server shuts down
+    atexit.register(store.flush)
+    return store
@@ -0,0 +1,114 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import streamlit as st
+
+from startup import lazy_import
+
+# Widths of the derivatives sent to the browser; originals are only sent on explicit download
+PREVIEW_WIDTH = 768
+THUMBNAIL_WIDTH = 320
+PLACEHOLDER_WIDTH = 32
+DERIVATIVE_CACHE_MB = 128
+
+
+@functools.lru_cache(maxsize=None)
+def derivative_format():
+    # Checked on first use so PIL isn't imported before an image is shown
+    return "WEBP" if lazy_import("PIL.features").check("webp") else "JPEG"
+
+
+class DerivativeCache:
+    # Encoded display-size images keyed by (content key, width), least recently used dropped first
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and self._items:
+                _, old = self._items.popitem(last=False)
+                self._size -= len(old)
+
+
+@st.cache_resource
+def get_derivative_cache():
+    # Shared by all sessions, so a gallery tile is encoded once per process
+    return DerivativeCache(DERIVATIVE_CACHE_MB * 1024 * 1024)
+
+
+def bytes_digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def image_digest(img):
+    # Hashing the pixels of a large image isn't free, so remember it on the image
+    # Size and mode are part of the key: a transposed image has the same bytes
+    if "preview_digest" not in img.info:
+        img.info["preview_digest"] = bytes_digest(f"{img.size}|{img.mode}|".encode() + img.tobytes())
+    return img.info["preview_digest"]
+
+
+def encode_derivative(img, width):
+    image_format = derivative_format()
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), lazy_import("PIL.Image").LANCZOS)
+    if image_format == "JPEG" or img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if image_format == "WEBP" else "RGB")
+    buffered = BytesIO()
+    img.save(buffered, format=image_format, quality=80)
+    return buffered.getvalue()
+
+
+def show_preview(container, key, load_image, width=PREVIEW_WIDTH, caption=None, on_hit=None):
+    # load_image is only called when the derivative isn't cached yet; while it's being
+    # made a tiny placeholder is shown so the layout appears straight away. on_hit runs
+    # instead when the cached derivative is used, e.g. to count it as an access.
+    cache = get_derivative_cache()
+    data = cache.get((key, width))
+    if data is None:
+        slot = container.empty()
+        img = load_image()
+        placeholder = cache.get((key, PLACEHOLDER_WIDTH))
+        if placeholder is None:
+            placeholder = encode_derivative(img, PLACEHOLDER_WIDTH)
+            cache.put((key, PLACEHOLDER_WIDTH), placeholder)
+        slot.image(placeholder, caption=caption, use_column_width=True)
+        data = encode_derivative(img, width)
+        cache.put((key, width), data)
+        slot.image(data, caption=caption, use_column_width=True)
+    else:
+        if on_hit is not None:
+            on_hit()
+        container.image(data, caption=caption, use_column_width=True)
+
+
+def show_image_preview(container, img, width=PREVIEW_WIDTH, caption=None):
+    show_preview(container, image_digest(img), lambda: img, width=width, caption=caption)
+
+
+def show_full_resolution_download(container, key, load_bytes, file_name):
+    # The original is encoded and sent only when asked for
+    if container.button("⬇️ Full resolution", key=f"prepare_{key}"):
+        try:
+            data = load_bytes()
+        except FileNotFoundError:
+            container.warning(f"{file_name} is no longer stored.")
+            return
+        container.download_button("Save original", data=data, file_name=file_name, key=f"download_{key}")
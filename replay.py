@@ -0,0 +1,332 @@
+# Replays API traffic recorded with TRAFFIC_CAPTURE=<path> (see traffic.py).
+#
+#   python replay.py serve trace.jsonl.gz --port 8765 --speed 10
+#       Stand-in for the Stability API that answers each endpoint with the recorded status,
+#       content type, payload size and (scaled) latency. Run either app against it with
+#       STABILITY_API_BASE=http://localhost:8765 to measure it on real traffic shapes.
+#
+#   python replay.py run trace.jsonl.gz --target http://localhost:8765 --speed 10 --out v2.json
+#       Re-drives the recorded requests through the app's own code (StabilityClient: requests,
+#       polling, decoding and OutputStore saves), with payloads of the recorded sizes, at the
+#       original pace divided by --speed. Reports latency per endpoint as the app sees it, and
+#       CPU time and peak memory of this process, which runs the app code.
+#
+#   python replay.py compare v1.json v2.json
+#       Compares two run reports, e.g. from before and after a change.
+import argparse
+import base64
+import gzip
+import json
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from jobs import PollScheduler
+from output_store import LocalBackend, OutputStore
+from router import TEXT_TO_IMAGE_MODELS, ModelRouter
+from stability_api import POLL_INTERVAL_SECONDS, APIError, StabilityClient
+from startup import get_http_session
+from traffic import TrafficRecorder
+
+# Smallest valid PNG; image responses are padded after it to the recorded size
+TINY_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+def load_trace(path):
+    # The trace may still be written to, or cut short by a crash: stop at a truncated gzip
+    # member or a half-written last line and keep everything before it
+    opener = gzip.open if path.endswith(".gz") else open
+    events = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                if line.strip():
+                    events.append(json.loads(line))
+        except (EOFError, gzip.BadGzipFile):
+            pass
+    return sorted(events, key=lambda event: event["ts"])
+
+
+def endpoint_name(event):
+    # Group polls for different generations under one name
+    path = urlsplit(event["url"]).path
+    if event.get("generation_id"):
+        path = path.replace(event["generation_id"], "{id}")
+    return f"{event['method']} {path}"
+
+
+def synthetic_response(event):
+    size = event.get("response_size") or 0
+    content_type = event.get("content_type") or "application/octet-stream"
+    if "application/json" in content_type:
+        if event.get("status") == 202 or event["method"] == "POST" and event.get("generation_id"):
+            body = json.dumps({"id": event.get("generation_id"), "status": "in-progress"}).encode()
+        elif event["method"] == "POST":
+            # One artifact per requested sample, sharing the recorded size; base64 grows data by
+            # a third, so the images together are padded to three quarters of it
+            samples = max(1, int((event.get("data") or {}).get("samples") or 1))
+            image = TINY_PNG + bytes(max(0, size * 3 // 4 // samples - len(TINY_PNG)))
+            artifact = {"base64": base64.b64encode(image).decode(), "seed": 0}
+            body = json.dumps({"artifacts": [artifact] * samples}).encode()
+        else:
+            body = json.dumps({"padding": "x" * max(0, size - 20)}).encode()
+    elif content_type.startswith("image/"):
+        body = TINY_PNG + bytes(max(0, size - len(TINY_PNG)))
+    else:
+        body = bytes(size)
+    return event.get("status") or 502, content_type, body
+
+
+def serve(args):
+    events = [event for event in load_trace(args.trace) if event["method"] in ("GET", "POST")]
+    responses = defaultdict(list)
+    for event in events:
+        responses[(event["method"], urlsplit(event["url"]).path)].append(event)
+    cursors = defaultdict(int)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            key = (self.command, urlsplit(self.path).path)
+            with lock:
+                recorded = responses.get(key)
+                if recorded:
+                    # Answer in recorded order and start over once a route runs out
+                    event = recorded[cursors[key] % len(recorded)]
+                    cursors[key] += 1
+            if not recorded:
+                self.send_error(404, "No recorded traffic for this endpoint")
+                return
+            time.sleep(event["latency"] / args.speed)
+            status, content_type, body = synthetic_response(event)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = _respond
+        do_POST = _respond
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    print(f"Serving {len(events)} recorded responses on http://127.0.0.1:{args.port} at {args.speed}x speed")
+    server.serve_forever()
+
+
+def request_payload(event):
+    data = {
+        key: "x" * value["redacted_length"] if isinstance(value, dict) and "redacted_length" in value else value
+        for key, value in event.get("data", {}).items()
+    }
+    # The app sends a dummy field when there are no files, so the request is still multipart
+    files = {field: bytes(info["size"]) for field, info in event.get("files", {}).items()} or {"none": ""}
+    return data, files
+
+
+def build_client(target, root, speed, concurrency):
+    # The app's client with its pooled session, output store, router and poll scheduler, as
+    # main2.py wires them up, pointed at the stand-in server
+    return StabilityClient(
+        target.rstrip("/"),
+        "replay",
+        "replay",
+        get_http_session(),
+        OutputStore(root, 1 << 40, LocalBackend(root)),
+        ModelRouter(TEXT_TO_IMAGE_MODELS),
+        TrafficRecorder(None),
+        PollScheduler(ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay-poll")),
+        ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) * 2), thread_name_prefix="replay-decode"),
+        poll_interval=POLL_INTERVAL_SECONDS / speed,
+    )
+
+
+def save_result(client, response):
+    # What display_image, display_video and display_3d_model save for a finished job
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.startswith("image/") or "application/json" in content_type:
+        client.save_images(response, "replay_image")
+    elif content_type.startswith("video/"):
+        client.save_file(response, "replay_video", "mp4")
+    elif content_type.startswith("model/"):
+        client.save_file(response, "replay_model", "glb")
+    else:
+        client.save_file(response, "replay_output", "bin")
+
+
+def replay_event(client, event, poll_events):
+    url = client.api_base + urlsplit(event["url"]).path
+    job = {"id": f"replay-{event['ts']}", "progress": ""}
+    started = time.time()
+    response = None
+    try:
+        if event["method"] == "GET":
+            response = client.fetch_account_job(job, url)
+        elif event.get("generation_id") in poll_events:
+            poll = poll_events[event["generation_id"]]
+            result_url = client.api_base + urlsplit(poll["url"]).path.rsplit("/", 1)[0]
+            data, files = request_payload(event)
+            response = client.generation_job(job, url, files, data, result_url, poll.get("accept") or "*/*").result()
+            save_result(client, response)
+        else:
+            data, files = request_payload(event)
+            response = client.post_job(job, url, files, data, event.get("accept"))
+            save_result(client, response)
+        status = response.status_code
+    except APIError as e:
+        status = e.status_code
+    except Exception:
+        status = None
+    return endpoint_name(event), time.time() - started, status, len(response.content) if response is not None else 0
+
+
+def run(args):
+    events = load_trace(args.trace)
+    # Result polls aren't replayed one by one: the client polls for itself, as the app does
+    poll_events = {}
+    for event in events:
+        if event["method"] == "GET" and event.get("generation_id"):
+            poll_events.setdefault(event["generation_id"], event)
+    skipped = [event for event in events if event["method"] not in ("GET", "POST")]
+    events = [
+        event for event in events
+        if event["method"] == "POST" or event["method"] == "GET" and not event.get("generation_id")
+    ]
+    if not events:
+        print("Nothing to replay.")
+        return
+    root = args.output_root or tempfile.mkdtemp(prefix="replay-")
+    tracemalloc.start()
+    cpu_start = resource.getrusage(resource.RUSAGE_SELF)
+    client = build_client(args.target, root, args.speed, args.concurrency)
+    start = time.time()
+    first_ts = events[0]["ts"]
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for event in events:
+            # Keep the recorded pacing, compressed by --speed
+            delay = (event["ts"] - first_ts) / args.speed - (time.time() - start)
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(replay_event, client, event, poll_events))
+        results = [future.result() for future in futures]
+    # Saves are written behind; wait for them so their cost is part of the run
+    client.output_store.flush()
+    wall_time = time.time() - start
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cpu_end = resource.getrusage(resource.RUSAGE_SELF)
+
+    by_endpoint = defaultdict(list)
+    for name, latency, status, size in results:
+        by_endpoint[name].append((latency, status, size))
+    report = {
+        "requests": len(results),
+        "skipped": len(skipped),
+        "wall_time": round(wall_time, 3),
+        "cpu_seconds": round(
+            cpu_end.ru_utime + cpu_end.ru_stime - cpu_start.ru_utime - cpu_start.ru_stime, 3
+        ),
+        "peak_traced_mb": round(peak_traced / (1024 * 1024), 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "endpoints": {},
+    }
+    for name, rows in sorted(by_endpoint.items()):
+        latencies = sorted(latency for latency, _, _ in rows)
+        report["endpoints"][name] = {
+            "count": len(rows),
+            "errors": sum(status is None or status >= 400 for _, status, _ in rows),
+            "p50": round(statistics.median(latencies), 4),
+            "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4),
+            "bytes": sum(size for _, _, size in rows),
+        }
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def print_report(report):
+    print(
+        f"{report['requests']} requests in {report['wall_time']}s "
+        f"using {report.get('cpu_seconds', '?')}s CPU ({report['skipped']} non-HTTP events skipped), "
+        f"peak traced memory {report['peak_traced_mb']} MB, max RSS {report['max_rss_mb']} MB"
+    )
+    for name, stats in report["endpoints"].items():
+        print(
+            f"  {name}: {stats['count']} calls, {stats['errors']} errors, "
+            f"p50 {stats['p50']}s, p95 {stats['p95']}s, {stats['bytes']} bytes"
+        )
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{old} -> {new} ({(new - old) / old:+.1%})" if old else f"{old} -> {new}"
+
+    print(f"wall time: {change(before['wall_time'], after['wall_time'])}")
+    if "cpu_seconds" in before and "cpu_seconds" in after:
+        print(f"CPU seconds: {change(before['cpu_seconds'], after['cpu_seconds'])}")
+    print(f"peak traced MB: {change(before['peak_traced_mb'], after['peak_traced_mb'])}")
+    print(f"max RSS MB: {change(before['max_rss_mb'], after['max_rss_mb'])}")
+    for name in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old, new = before["endpoints"].get(name), after["endpoints"].get(name)
+        if old and new:
+            print(f"  {name}: p50 {change(old['p50'], new['p50'])}, p95 {change(old['p95'], new['p95'])}")
+        else:
+            print(f"  {name}: only in {'before' if old else 'after'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay API traffic recorded with TRAFFIC_CAPTURE.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run a stand-in API server that answers with recorded traffic.")
+    serve_parser.add_argument("trace")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--speed", type=float, default=1.0, help="Divide recorded latencies by this factor.")
+    serve_parser.add_argument("--verbose", action="store_true")
+    serve_parser.set_defaults(func=serve)
+
+    run_parser = commands.add_parser("run", help="Re-drive the recorded requests through the app's client against a server.")
+    run_parser.add_argument("trace")
+    run_parser.add_argument("--target", default="http://127.0.0.1:8765")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="Divide recorded pacing by this factor.")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--out", help="Write the report as JSON for later comparison.")
+    run_parser.add_argument("--output-root", help="Where the replayed results are saved (default: a temporary directory).")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two run reports.")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+
+import streamlit as st
+
+# Text-to-image models the router can pick from. Credits are per image; tier is a rough
+# quality ranking (3 best) and latency the seconds assumed until real timings come in.
+TEXT_TO_IMAGE_MODELS = {
+    "Stable Image Ultra": {"tier": 3, "credits": 8, "latency": 15},
+    "Stable Image Core": {"tier": 2, "credits": 3, "latency": 6},
+    "Stable Diffusion 3.5 Large": {"tier": 3, "credits": 6.5, "latency": 14},
+    "Stable Diffusion 3.5 Large Turbo": {"tier": 2, "credits": 4, "latency": 6},
+    "Stable Diffusion 3.0 Large": {"tier": 2, "credits": 6.5, "latency": 14},
+    "Stable Diffusion 3.0 Large Turbo": {"tier": 1, "credits": 4, "latency": 6},
+    "Stable Diffusion 3.0 Medium": {"tier": 1, "credits": 3.5, "latency": 8},
+}
+QUALITY_TIERS = {"Draft": 1, "Standard": 2, "Premium": 3}
+STATS_WINDOW = 50
+# Samples older than this are dropped, so a model that failed a while ago gets another chance
+STATS_MAX_AGE_SECONDS = 600
+MIN_SAMPLES = 3
+# A model failing more often than this over the window is only tried after healthy ones
+MAX_ERROR_RATE = 0.5
+RATE_LIMIT_COOLDOWN_SECONDS = 60
+SERVER_ERROR_COOLDOWN_SECONDS = 20
+
+
+def model_key(url, data):
+    # Stats are kept per model: the SD3 endpoint serves several, the others one each
+    return data.get("model") or url.rsplit("/", 1)[-1]
+
+
+def text_to_image_model_key(model_type):
+    if model_type == "Stable Image Ultra":
+        return "ultra"
+    if model_type == "Stable Image Core":
+        return "core"
+    return model_type.lower().replace(" ", "-")
+
+
+class ModelRouter:
+    def __init__(self, models):
+        self.models = models
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+        self._cooldown_until = {}
+
+    def record(self, key, latency, status_code):
+        # status_code is None when the request never got a response. Other 4xx responses
+        # (bad parameters, moderation) are about the request, not the model, so they are ignored.
+        if status_code is not None and 400 <= status_code < 500 and status_code != 429:
+            return
+        ok = status_code is not None and status_code < 400
+        with self._lock:
+            self._samples[key].append((time.time(), latency, ok))
+            if status_code == 429:
+                self._cooldown_until[key] = time.time() + RATE_LIMIT_COOLDOWN_SECONDS
+            elif status_code is None or status_code >= 500:
+                self._cooldown_until[key] = time.time() + SERVER_ERROR_COOLDOWN_SECONDS
+
+    def stats(self, key):
+        # (median latency of successful calls or None, error rate, number of calls)
+        cutoff = time.time() - STATS_MAX_AGE_SECONDS
+        with self._lock:
+            samples = self._samples[key]
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            samples = list(samples)
+        latencies = [latency for _, latency, ok in samples if ok]
+        median = statistics.median(latencies) if len(latencies) >= MIN_SAMPLES else None
+        error_rate = sum(not ok for _, _, ok in samples) / len(samples) if samples else 0.0
+        return median, error_rate, len(samples)
+
+    def is_healthy(self, key):
+        with self._lock:
+            cooling = self._cooldown_until.get(key, 0) > time.time()
+        _, error_rate, calls = self.stats(key)
+        # A couple of failures are too few to judge a model by
+        return not cooling and (calls < MIN_SAMPLES or error_rate <= MAX_ERROR_RATE)
+
+    def expected_latency(self, model_type):
+        median = self.stats(text_to_image_model_key(model_type))[0]
+        return median if median is not None else self.models[model_type]["latency"]
+
+    def rank(self, min_tier, max_credits):
+        # Models meeting the tier and budget, fastest first; degraded or rate-limited
+        # models go last so they are only used as a failover
+        candidates = [
+            name for name, info in self.models.items()
+            if info["tier"] >= min_tier and info["credits"] <= max_credits
+        ]
+        candidates.sort(key=self.expected_latency)
+        healthy = [name for name in candidates if self.is_healthy(text_to_image_model_key(name))]
+        return healthy + [name for name in candidates if name not in healthy]
+
+
+@st.cache_resource
+def get_router():
+    # Timings from every session feed the same statistics
+    return ModelRouter(TEXT_TO_IMAGE_MODELS)
@@ -0,0 +1,53 @@
+# Launches a Streamlit app with heavy imports, the HTTP connection pool and model metadata
+# warmed up at process start, so the first session on a new replica doesn't pay for them.
+#
+#   python serve.py main2.py [streamlit run options]
+#
+# PREWARM_MODELS (comma-separated Replicate models) and REPLICATE_API_TOKEN prefetch model
+# metadata for main.py; STABILITY_API_BASE sets which host the connection pool warms up.
+import os
+import sys
+import time
+
+import startup
+
+PREWARM_IMPORTS = {
+    "main.py": ["replicate", "dotenv"],
+    "main2.py": ["requests", "PIL.Image", "streamlit_drawable_canvas", "sqlite3"],
+}
+
+
+def prewarm(script):
+    started = time.perf_counter()
+    for name in PREWARM_IMPORTS.get(os.path.basename(script), []):
+        try:
+            startup.lazy_import(name)
+        except ImportError as e:
+            print(f"Prewarm: could not import {name}: {e}")
+    startup.warm_connections(os.getenv("STABILITY_API_BASE", "https://api.stability.ai"))
+    api_token = os.getenv("REPLICATE_API_TOKEN")
+    for model_name in filter(None, os.getenv("PREWARM_MODELS", "").split(",")):
+        if api_token:
+            try:
+                startup.get_replicate_version(api_token, model_name.strip())
+            except Exception as e:
+                print(f"Prewarm: could not load {model_name}: {e}")
+    timings = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in startup.import_timings.items())
+    print(f"Prewarm finished in {(time.perf_counter() - started) * 1000:.0f}ms ({timings or 'nothing imported'})")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python serve.py <app.py> [streamlit run options]")
+        sys.exit(2)
+    script = sys.argv[1]
+    prewarm(script)
+    # Run Streamlit in this process so the warmed modules and pools are reused by every session
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", script, *sys.argv[2:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
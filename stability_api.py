@@ -0,0 +1,225 @@
+import base64
+import time
+from io import BytesIO
+
+import requests
+
+from jobs import then
+from router import model_key, text_to_image_model_key
+from startup import lazy_import
+
+POLL_INTERVAL_SECONDS = 10
+MAX_POLLS = 30
+
+
+class APIError(RuntimeError):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def check_response(response):
+    # Raised errors are shown on the failed job in the sidebar
+    if response.status_code != 200:
+        try:
+            message = response.json().get('message', response.text)
+        except:
+            message = response.text
+        raise APIError(f"Error: {response.status_code} - {message}", response.status_code)
+    return response
+
+
+def request_record(url, files, data, accept_header=None, result_url=None):
+    # The input files travel with the record and are stored by asset_metadata, in the
+    # workspace of every session the result is saved for, not only the one that sent it
+    return {
+        "endpoint": url,
+        "params": data,
+        "accept_header": accept_header,
+        "result_url": result_url,
+        "files": {field: content for field, content in files.items() if content},
+    }
+
+
+class StabilityClient:
+    # How main2.py calls the API and saves what comes back. Nothing here touches st.*, so the
+    # methods can run on job workers, and replay.py can drive the same code outside Streamlit.
+    def __init__(self, api_base, api_key, workspace, http, output_store, router, recorder, poll_scheduler,
+                 decode_pool, poll_interval=POLL_INTERVAL_SECONDS):
+        self.api_base = api_base
+        self.api_key = api_key
+        self.workspace = workspace
+        self.http = http
+        self.output_store = output_store
+        self.router = router
+        self.recorder = recorder
+        self.poll_scheduler = poll_scheduler
+        self.decode_pool = decode_pool
+        self.poll_interval = poll_interval
+
+    def fetch_result(self, result_url, accept_header, **trace):
+        started = time.time()
+        result_response = self.http.get(
+            result_url,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Accept": accept_header,
+            },
+        )
+        self.recorder.record(
+            "GET", result_url, result_response, time.time() - started,
+            session=self.workspace, accept=accept_header, **trace,
+        )
+        return result_response
+
+    def start_polling(self, job, generation_id, result_url, accept_header):
+        # Returns a future for the finished result; each attempt runs on the pool only while it fetches
+        def attempt(number):
+            result_response = self.fetch_result(
+                result_url, accept_header, job=job.get("id"), generation_id=generation_id, poll_attempt=number
+            )
+            if result_response.status_code == 200:
+                return result_response
+            elif result_response.status_code == 202:
+                job["progress"] = f"Generation in progress... ({number}/{MAX_POLLS})"
+                return None
+            else:
+                check_response(result_response)
+
+        return self.poll_scheduler.poll(attempt, self.poll_interval, MAX_POLLS)
+
+    def send_request(self, job, url, files, data, accept_header=None):
+        request_headers = {"Authorization": f"Bearer {self.api_key}"}
+        if accept_header:
+            request_headers["Accept"] = accept_header
+        job["progress"] = "Waiting for response..."
+        # Every call feeds the router's per-model latency and error statistics
+        started = time.time()
+        try:
+            response = self.http.post(url, headers=request_headers, files=files, data=data)
+        except requests.RequestException:
+            self.router.record(model_key(url, data), time.time() - started, None)
+            self.recorder.record(
+                "POST", url, None, time.time() - started, data, files, session=self.workspace, job=job.get("id")
+            )
+            raise
+        latency = time.time() - started
+        self.router.record(model_key(url, data), latency, response.status_code)
+        generation_id = None
+        if self.recorder.enabled and response.status_code == 200 and 'application/json' in response.headers.get('Content-Type', ''):
+            generation_id = response.json().get("id")
+        self.recorder.record(
+            "POST", url, response, latency, data, files,
+            session=self.workspace, job=job.get("id"), accept=accept_header, generation_id=generation_id,
+        )
+        return check_response(response)
+
+    def post_job(self, job, url, files, data, accept_header=None):
+        response = self.send_request(job, url, files, data, accept_header)
+        response.generation_request = request_record(url, files, data, accept_header)
+        return response
+
+    def generation_job(self, job, url, files, data, result_url, accept_header):
+        response = self.send_request(job, url, files, data)
+        generation_id = response.json().get("id")
+        job["generation_id"] = generation_id
+        job["progress"] = f"Generation ID: {generation_id}"
+
+        def finish(result_response):
+            result_response.generation_request = request_record(url, files, data, accept_header, result_url)
+            return result_response
+
+        return then(self.start_polling(job, generation_id, f"{result_url}/{generation_id}", accept_header), finish)
+
+    def text_to_image_request(self, model_type, data):
+        # Endpoint, form data and Accept header for a text-to-image model
+        if model_type == "Stable Image Ultra":
+            return f"{self.api_base}/v2beta/stable-image/generate/ultra", data, "image/*"
+        if model_type == "Stable Image Core":
+            return f"{self.api_base}/v2beta/stable-image/generate/core", data, "image/*"
+        # Stable Diffusion 3.0 & 3.5
+        return (
+            f"{self.api_base}/v2beta/stable-image/generate",
+            dict(data, model=text_to_image_model_key(model_type)),
+            "application/json",
+        )
+
+    def auto_text_to_image_job(self, job, data, min_tier, max_credits):
+        candidates = self.router.rank(min_tier, max_credits)
+        if not candidates:
+            raise RuntimeError("No model meets that quality tier within the credit budget.")
+        errors = []
+        for model_type in candidates:
+            job["label"] = f"Text-to-Image (auto: {model_type})"
+            url, model_data, accept_header = self.text_to_image_request(model_type, data)
+            try:
+                return self.post_job(job, url, {"none": ""}, model_data, accept_header)
+            except APIError as e:
+                # Fail over on rate limits and server errors only; a rejected prompt fails on every model
+                if e.status_code != 429 and e.status_code < 500:
+                    raise
+                errors.append(f"{model_type}: {e}")
+            except requests.RequestException as e:
+                errors.append(f"{model_type}: {e}")
+        raise RuntimeError("Every candidate model failed - " + "; ".join(errors))
+
+    def fetch_account_job(self, job, url):
+        started = time.time()
+        response = self.http.get(url, headers={"Authorization": f"Bearer {self.api_key}"})
+        self.recorder.record("GET", url, response, time.time() - started, session=self.workspace, job=job.get("id"))
+        return check_response(response)
+
+    def asset_metadata(self, response, seed=None):
+        # Searchable metadata for a result, including the request needed to reproduce it
+        record = getattr(response, "generation_request", None)
+        if record is None:
+            return None
+        params = dict(record["params"])
+        # Keep the seed the API actually used so random-seed results can be reproduced exactly
+        if seed:
+            params["seed"] = int(seed)
+        # Input files are kept as assets so the request can be re-issued byte for byte
+        inputs = {
+            field: self.output_store.save(self.workspace, content, "input", "bin")
+            for field, content in record["files"].items()
+        }
+        request = {key: value for key, value in record.items() if key != "files"}
+        return {
+            "endpoint": record["endpoint"],
+            "model": model_key(record["endpoint"], params),
+            "seed": params.get("seed"),
+            "prompt": params.get("prompt"),
+            "request": dict(request, params=params, inputs=inputs),
+        }
+
+    def save_image_bytes(self, img_data, save_prefix, metadata=None):
+        # PIL is imported when an image is first decoded rather than on the first page load
+        img = lazy_import("PIL.Image").open(BytesIO(img_data))
+        img.load()
+        # Store the bytes exactly as the API encoded them instead of re-encoding to PNG
+        ext = "jpg" if img.format == "JPEG" else (img.format or "png").lower()
+        self.output_store.save(self.workspace, img_data, save_prefix, ext, metadata=metadata)
+        return img
+
+    def decode_and_save_artifact(self, artifact, save_prefix, metadata=None):
+        return self.save_image_bytes(base64.b64decode(artifact['base64']), save_prefix, metadata)
+
+    def save_images(self, response, save_prefix):
+        # Every image in a successful response, decoded and saved
+        content_type = response.headers.get('Content-Type')
+        if content_type and 'application/json' in content_type:
+            artifacts = response.json().get('artifacts', [])
+            # Decode and save every sample concurrently instead of keeping only the first
+            metadata = [self.asset_metadata(response, artifact.get('seed')) for artifact in artifacts]
+            return list(self.decode_pool.map(
+                self.decode_and_save_artifact, artifacts, [save_prefix] * len(artifacts), metadata
+            ))
+        return [self.save_image_bytes(response.content, save_prefix, self.asset_metadata(response, response.headers.get('seed')))]
+
+    def save_file(self, response, save_prefix, ext):
+        # Videos and 3D models are stored as returned
+        self.output_store.save(
+            self.workspace, response.content, save_prefix, ext,
+            metadata=self.asset_metadata(response, response.headers.get('seed')),
+        )
+        return response.content
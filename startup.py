@@ -0,0 +1,147 @@
+import hashlib
+import http.cookiejar
+import importlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+# Opt-in startup-optimized mode: optional components load when first opened and a
+# startup timing breakdown is shown in the sidebar
+STARTUP_OPTIMIZED = os.getenv("STARTUP_OPTIMIZED", "0") == "1"
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+METADATA_TTL_SECONDS = 600
+# Entries with a TTL (e.g. model metadata per API key) kept at most; the oldest go first
+MEMO_MAX_ENTRIES = 256
+
+PROCESS_STARTED = time.time()
+# Seconds spent importing each lazily imported module, in this process
+import_timings = {}
+_lock = threading.Lock()
+_memo = OrderedDict()
+_imported = {}
+
+
+def lazy_import(name):
+    # Import a module on first use and remember how long it took. A module another thread is
+    # still importing is already in sys.modules, so only fully imported ones are returned
+    # directly; import_module waits for the rest.
+    module = _imported.get(name)
+    if module is not None:
+        return module
+    loaded = name in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        if name not in _imported:
+            _imported[name] = module
+            if not loaded:
+                import_timings[name] = time.perf_counter() - started
+    return module
+
+
+def memoize(key, compute, ttl=None):
+    # Process-wide cache that works before the Streamlit runtime exists, so serve.py can fill it
+    now = time.time()
+    with _lock:
+        entry = _memo.get(key)
+        if entry is not None and (ttl is None or now - entry[1] < ttl):
+            _memo.move_to_end(key)
+            return entry[0]
+    value = compute()
+    with _lock:
+        _memo[key] = (value, time.time(), ttl)
+        _memo.move_to_end(key)
+        # Drop expired entries, then the least recently used ones past the limit; entries
+        # without a TTL (the HTTP session, warm-up markers) are kept for the process
+        for old, (_, stored, old_ttl) in list(_memo.items()):
+            if old_ttl is not None and old != key and now - stored >= old_ttl:
+                del _memo[old]
+        expiring = [old for old, entry in _memo.items() if entry[2] is not None]
+        for old in expiring[:-MEMO_MAX_ENTRIES]:
+            del _memo[old]
+    return value
+
+
+def get_http_session():
+    # One pooled session per process so TLS connections to the API are reused across requests and sessions
+    def create():
+        requests = lazy_import("requests")
+        session = requests.Session()
+        # Sessions of different users share this object, so cookies set for one must not be
+        # sent for another; only the connection pool is shared
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    return memoize("http_session", create)
+
+
+def warm_connections(base_url, count=2):
+    # Open a few connections in the background, once per process and host; the response
+    # itself doesn't matter
+    session = get_http_session()
+
+    def connect():
+        try:
+            session.head(base_url, timeout=5)
+        except Exception:
+            pass
+
+    def start():
+        for _ in range(count):
+            threading.Thread(target=connect, name="http-prewarm", daemon=True).start()
+        return True
+
+    memoize(("warm_connections", base_url), start)
+
+
+def get_replicate_version(api_key, model_name):
+    # Model lookups cost two API calls, so keep them per process rather than per session
+    def fetch():
+        replicate = lazy_import("replicate")
+        model = replicate.Client(api_token=api_key).models.get(model_name)
+        return model, model.versions.list()[0]
+
+    # Keyed by a hash so API keys aren't kept around as cache keys
+    credential = hashlib.sha256(api_key.encode()).hexdigest()
+    return memoize(("replicate", credential, model_name), fetch, ttl=METADATA_TTL_SECONDS)
+
+
+class RenderTimer:
+    # Time between marks in one script run, to see what the first render of a session spends its time on
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.started
+
+
+def show_startup_timings(container, timer):
+    # Import costs are per process; the render breakdown is from this session's first run
+    if "first_render" not in st.session_state:
+        st.session_state["first_render"] = (timer.stages, timer.total())
+    stages, total = st.session_state["first_render"]
+    with container.expander("⏱️ Startup timings"):
+        st.caption(f"Process started {time.time() - PROCESS_STARTED:.0f}s ago")
+        st.markdown("**Imports**")
+        if import_timings:
+            for name, seconds in sorted(import_timings.items(), key=lambda item: -item[1]):
+                st.text(f"{name}: {seconds * 1000:.0f} ms")
+        else:
+            st.caption("No deferred imports yet.")
+        st.markdown(f"**First render: {total * 1000:.0f} ms**")
+        for stage, seconds in stages:
+            st.text(f"{stage}: {seconds * 1000:.0f} ms")
@@ -0,0 +1,27 @@
+# Most runs one parameter sweep may submit
+MAX_SWEEP_SIZE = 24
+
+
+def parse_sweep_values(text, cast):
+    # "1.5, 2, 3" lists values and "64:192:32" is an inclusive start:stop:step range.
+    # Expansion stops past MAX_SWEEP_SIZE so a mistyped range can't hang the script.
+    values = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            start, stop, step = (cast(value) for value in part.split(":"))
+            if step <= 0:
+                raise ValueError(f"Step must be positive in '{part}'")
+            value = start
+            while value <= stop + 1e-9:
+                values.append(cast(round(value, 6)))
+                if len(values) > MAX_SWEEP_SIZE:
+                    raise ValueError(f"More than {MAX_SWEEP_SIZE} values")
+                value += step
+        else:
+            values.append(cast(part))
+            if len(values) > MAX_SWEEP_SIZE:
+                raise ValueError(f"More than {MAX_SWEEP_SIZE} values")
+    return list(dict.fromkeys(values))
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from jobs import PollScheduler, SingleFlight, request_fingerprint, then
+
+
+@pytest.fixture
+def scheduler():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield PollScheduler(pool)
+    pool.shutdown(wait=False)
+
+
+def test_single_flight_shares_running_call():
+    flight = SingleFlight()
+    started = []
+
+    def start():
+        started.append(Future())
+        return started[-1]
+
+    future, leader = flight.submit("same", "job-1", start)
+    shared, shared_leader = flight.submit("same", "job-2", start)
+    assert shared is future and shared_leader == leader == "job-1"
+    other, _ = flight.submit("other", "job-3", start)
+    assert other is not future
+    assert len(started) == 2
+    assert (flight.submitted, flight.coalesced) == (3, 1)
+
+    # Once the call finishes, the next identical submission starts a new one
+    future.set_result("done")
+    again, again_leader = flight.submit("same", "job-4", start)
+    assert again is not future and again_leader == "job-4"
+
+
+def test_fingerprint_depends_on_credential_and_inputs():
+    data = {"prompt": "a cat", "seed": 42}
+    base = request_fingerprint("url", {"image": b"abc"}, data, credential="key-1")
+    assert base == request_fingerprint("url", {"image": b"abc"}, {"prompt": "a cat", "seed": "42"}, credential="key-1")
+    assert base != request_fingerprint("url", {"image": b"abc"}, data, credential="key-2")
+    assert base != request_fingerprint("url", {"image": b"abd"}, data, credential="key-1")
+
+
+def test_poll_returns_first_result(scheduler):
+    attempts = []
+
+    def attempt(number):
+        attempts.append(number)
+        return "ready" if number == 3 else None
+
+    assert scheduler.poll(attempt, 0.01, 5).result(timeout=5) == "ready"
+    assert attempts == [1, 2, 3]
+
+
+def test_poll_times_out(scheduler):
+    attempts = []
+    future = scheduler.poll(lambda number: attempts.append(number), 0.01, 4)
+    with pytest.raises(RuntimeError, match="timed out"):
+        future.result(timeout=5)
+    assert attempts == [1, 2, 3, 4]
+
+
+def test_poll_stops_on_error(scheduler):
+    def attempt(number):
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError, match="bad request"):
+        scheduler.poll(attempt, 0.01, 5).result(timeout=5)
+
+
+def test_call_later_runs_in_deadline_order(scheduler):
+    order = []
+    done = threading.Event()
+    scheduler.call_later(0.2, lambda: (order.append("late"), done.set()))
+    scheduler.call_later(0.05, lambda: order.append("early"))
+    assert done.wait(5)
+    assert order == ["early", "late"]
+
+
+def test_then_chains_result_and_errors():
+    source = Future()
+    chained = then(source, lambda value: value * 2)
+    source.set_result(21)
+    assert chained.result(timeout=1) == 42
+
+    failing = Future()
+    chained = then(failing, lambda value: value)
+    failing.set_exception(KeyError("missing"))
+    with pytest.raises(KeyError):
+        chained.result(timeout=1)
@@ -0,0 +1,140 @@
+import os
+import threading
+
+import pytest
+
+from output_store import AssetNotFoundError, LocalBackend, OutputStore
+
+
+class GatedBackend(LocalBackend):
+    # Holds every write until the test opens the gate, so entries stay pending
+    def __init__(self, root):
+        super().__init__(root)
+        self.gate = threading.Event()
+
+    def put(self, key, data):
+        self.gate.wait(5)
+        super().put(key, data)
+
+
+def make_store(tmp_path, backend=None, quota_bytes=1024 * 1024):
+    return OutputStore(str(tmp_path / "index"), quota_bytes, backend or LocalBackend(str(tmp_path / "files")))
+
+
+def metadata(prompt, model="core", seed=1):
+    return {"endpoint": "https://api/generate", "model": model, "seed": seed, "prompt": prompt, "request": {}}
+
+
+def test_pending_bytes_readable_before_write(tmp_path):
+    backend = GatedBackend(str(tmp_path / "files"))
+    store = make_store(tmp_path, backend)
+    name = store.save("alice", b"image", "img", "png")
+    assert store.read("alice", name) == b"image"
+    assert store.list("alice") == [name]
+    with pytest.raises(AssetNotFoundError):
+        backend.get(f"alice/{name}")
+    backend.gate.set()
+    store.flush()
+    assert backend.get(f"alice/{name}") == b"image"
+
+
+def test_same_bytes_saved_once(tmp_path):
+    store = make_store(tmp_path)
+    assert store.save("alice", b"image", "img", "png") == store.save("alice", b"image", "img", "png")
+    store.flush()
+    assert store.usage() == len(b"image")
+
+
+def test_eviction_skips_pending_writes(tmp_path):
+    backend = GatedBackend(str(tmp_path / "files"))
+    store = make_store(tmp_path, backend)
+    name = store.save("alice", b"x" * 100, "img", "png")
+    store.quota_bytes = 10
+    store.evict()
+    assert store.list("alice") == [name]
+    backend.gate.set()
+    store.flush()
+    store.evict()
+    assert store.list("alice") == []
+    assert not os.path.exists(tmp_path / "files" / "alice" / name)
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    store = make_store(tmp_path)
+    old = store.save("alice", b"a" * 100, "img", "png")
+    new = store.save("alice", b"b" * 100, "img", "png")
+    store.flush()
+    store.touch("alice", old)
+    store.quota_bytes = 150
+    store.evict()
+    assert store.list("alice") == [old]
+    with pytest.raises(AssetNotFoundError):
+        store.read("alice", new)
+
+
+def test_save_after_eviction_writes_again(tmp_path):
+    store = make_store(tmp_path)
+    name = store.save("alice", b"a" * 100, "img", "png")
+    store.flush()
+    store.quota_bytes = 0
+    store.evict()
+    assert store.list("alice") == []
+    store.quota_bytes = 1024
+    assert store.save("alice", b"a" * 100, "img", "png") == name
+    store.flush()
+    assert store.read("alice", name) == b"a" * 100
+
+
+def test_missing_file_removes_row(tmp_path):
+    store = make_store(tmp_path)
+    name = store.save("alice", b"image", "img", "png", metadata=metadata("a red fox"))
+    store.flush()
+    os.remove(tmp_path / "files" / "alice" / name)
+    with pytest.raises(AssetNotFoundError):
+        store.read("alice", name)
+    assert store.list("alice") == []
+    assert store.metadata("alice", name) is None
+
+
+def test_reconcile_drops_rows_without_files(tmp_path):
+    store = make_store(tmp_path)
+    kept = store.save("alice", b"kept", "img", "png")
+    lost = store.save("alice", b"lost", "img", "png")
+    store.flush()
+    os.remove(tmp_path / "files" / "alice" / lost)
+    store.reconcile()
+    assert store.list("alice") == [kept]
+
+
+def test_reconcile_keeps_pending_rows(tmp_path):
+    backend = GatedBackend(str(tmp_path / "files"))
+    store = make_store(tmp_path, backend)
+    name = store.save("alice", b"image", "img", "png")
+    store.reconcile()
+    assert store.list("alice") == [name]
+    backend.gate.set()
+    store.flush()
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_prefix_search(tmp_path, fts):
+    store = make_store(tmp_path)
+    if not fts:
+        store._fts = False
+    elif not store._fts:
+        pytest.skip("SQLite built without FTS5")
+    city = store.save("alice", b"1", "img", "png", metadata=metadata("A cyberpunk city at night"))
+    fox = store.save("alice", b"2", "img", "png", metadata=metadata("a red fox, 100% cute_style", model="ultra"))
+    store.save("bob", b"3", "img", "png", metadata=metadata("cyberpunk street"))
+    assert store.search("alice", "cyber") == [city]
+    assert store.search("alice", "CITY cyber") == [city]
+    # Words match from the start only
+    assert store.search("alice", "punk") == []
+    assert store.search("alice", "100%") == [fox]
+    assert store.search("alice", "cute_") == [fox]
+    assert store.search("alice", 'fox"') == ([fox] if fts else [])
+    if not fts:
+        # LIKE wildcards typed by the user are matched literally
+        assert store.search("alice", "cu%") == []
+    assert store.search("alice", "", model="ultra") == [fox]
+    assert store.facets("alice") == (["core", "ultra"], ["https://api/generate"])
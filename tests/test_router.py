@@ -0,0 +1,54 @@
+import router
+from router import MIN_SAMPLES, TEXT_TO_IMAGE_MODELS, ModelRouter
+
+
+def test_rank_filters_by_tier_and_budget():
+    ranked = ModelRouter(TEXT_TO_IMAGE_MODELS).rank(3, 7)
+    assert ranked == ["Stable Diffusion 3.5 Large"]
+
+
+def test_rank_prefers_measured_latency():
+    models = {"Stable Image Core": TEXT_TO_IMAGE_MODELS["Stable Image Core"],
+              "Stable Image Ultra": TEXT_TO_IMAGE_MODELS["Stable Image Ultra"]}
+    model_router = ModelRouter(models)
+    assert model_router.rank(1, 10) == ["Stable Image Core", "Stable Image Ultra"]
+    for _ in range(MIN_SAMPLES):
+        model_router.record("ultra", 1.0, 200)
+        model_router.record("core", 9.0, 200)
+    assert model_router.rank(1, 10) == ["Stable Image Ultra", "Stable Image Core"]
+
+
+def test_client_errors_dont_count_against_a_model():
+    model_router = ModelRouter(TEXT_TO_IMAGE_MODELS)
+    for _ in range(MIN_SAMPLES + 2):
+        model_router.record("core", 1.0, 400)
+    assert model_router.stats("core") == (None, 0.0, 0)
+    assert model_router.is_healthy("core")
+
+
+def test_rate_limit_sends_model_to_the_back():
+    model_router = ModelRouter(TEXT_TO_IMAGE_MODELS)
+    model_router.record("core", 1.0, 429)
+    assert not model_router.is_healthy("core")
+    assert model_router.rank(2, 3) == ["Stable Image Core"]
+    assert model_router.rank(1, 4)[-1] == "Stable Image Core"
+
+
+def test_error_rate_needs_min_samples(monkeypatch):
+    model_router = ModelRouter(TEXT_TO_IMAGE_MODELS)
+    # Without cooldowns only the error rate decides
+    monkeypatch.setattr(router, "SERVER_ERROR_COOLDOWN_SECONDS", 0)
+    for _ in range(MIN_SAMPLES - 1):
+        model_router.record("ultra", 1.0, 500)
+    assert model_router.is_healthy("ultra")
+    model_router.record("ultra", 1.0, None)
+    assert not model_router.is_healthy("ultra")
+
+
+def test_old_samples_age_out(monkeypatch):
+    model_router = ModelRouter(TEXT_TO_IMAGE_MODELS)
+    for _ in range(MIN_SAMPLES):
+        model_router.record("core", 2.0, 200)
+    assert model_router.stats("core") == (2.0, 0.0, MIN_SAMPLES)
+    monkeypatch.setattr(router, "STATS_MAX_AGE_SECONDS", -1)
+    assert model_router.stats("core") == (None, 0.0, 0)
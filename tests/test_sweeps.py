@@ -0,0 +1,27 @@
+import pytest
+
+from sweeps import MAX_SWEEP_SIZE, parse_sweep_values
+
+
+def test_lists_and_ranges():
+    assert parse_sweep_values("1.5, 2, 3", float) == [1.5, 2.0, 3.0]
+    assert parse_sweep_values("64:192:64", int) == [64, 128, 192]
+    assert parse_sweep_values("0.1:0.3:0.1", float) == [0.1, 0.2, 0.3]
+
+
+def test_duplicates_and_empty_parts_dropped():
+    assert parse_sweep_values("4, 4,, 2:6:2", int) == [4, 2, 6]
+    assert parse_sweep_values("", int) == []
+
+
+def test_step_must_be_positive():
+    with pytest.raises(ValueError):
+        parse_sweep_values("1:5:0", int)
+
+
+def test_size_cap_stops_expansion():
+    with pytest.raises(ValueError):
+        parse_sweep_values("0:1000000000:1", int)
+    with pytest.raises(ValueError):
+        parse_sweep_values(", ".join(str(value) for value in range(MAX_SWEEP_SIZE + 1)), int)
+    assert len(parse_sweep_values(f"1:{MAX_SWEEP_SIZE}:1", int)) == MAX_SWEEP_SIZE
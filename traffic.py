@@ -0,0 +1,84 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+# Path of the trace file (".gz" for gzip); API traffic is only recorded when this is set
+TRAFFIC_CAPTURE = os.getenv("TRAFFIC_CAPTURE")
+
+
+def sanitize(data):
+    # Prompts can be personal, so only their length is kept; numbers and options are kept as-is
+    clean = {}
+    for key, value in data.items():
+        if isinstance(value, str) and "prompt" in key:
+            clean[key] = {"redacted_length": len(value)}
+        else:
+            clean[key] = value
+    return clean
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()[:16] if data else None
+
+
+class TrafficRecorder:
+    # Appends one JSON line per API interaction; replay.py reads the same format
+    def __init__(self, path):
+        self.enabled = path is not None
+        self._lock = threading.Lock()
+        self._file = None
+        # Each line is written as its own complete gzip member, so the trace can be read while
+        # the app runs and after a crash, not only once close() has written the gzip trailer
+        self._compress = path is not None and path.endswith(".gz")
+        if self.enabled:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "ab")
+            atexit.register(self.close)
+
+    def record(self, method, url, response, latency, data=None, files=None, **extra):
+        if not self.enabled:
+            return
+        body = response.content if response is not None else b""
+        event = {
+            "ts": round(time.time() - latency, 4),
+            "method": method,
+            "url": url,
+            "data": sanitize(data or {}),
+            "files": {
+                field: {"size": len(content), "sha256": digest(content)}
+                for field, content in (files or {}).items()
+                if content
+            },
+            "status": response.status_code if response is not None else None,
+            "content_type": response.headers.get("Content-Type") if response is not None else None,
+            "response_size": len(body),
+            "response_sha256": digest(body),
+            "latency": round(latency, 4),
+        }
+        event.update(extra)
+        line = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        if self._compress:
+            line = gzip.compress(line)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self.enabled = False
+
+
+@st.cache_resource
+def get_recorder():
+    # One trace file per server process, shared by all sessions
+    return TrafficRecorder(TRAFFIC_CAPTURE)